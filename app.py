@@ -1,8 +1,20 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
-import pickle
+import os
 import random
-from pre_process import load_files, process_text, loaddicchar, process_special_word, normalize_repeated_characters, process_postag_thesea, covert_unicode, analyze_general
+import tempfile
+import time
+import uuid
+from pre_process import load_files, ReviewPipeline, classify_reviews, classify_chunks, prediction_namespace
+from prediction_cache import PredictionCache
+from data_loader import MERGED_COLUMNS, read_dataset
+from compact_model import load_classifier
+from restaurant_summary import add_aspect_counts, build_summaries, compare_restaurants, is_up_to_date, load_summaries
+from restaurant_charts import ImageCache, prepare_restaurants
+from restaurant_view import analyze_general
+from review_store import ReviewStore
+from profiling import profiler, log_trace
 
 bg = """
 <style>
@@ -27,22 +39,105 @@ random.seed(42)
 suggested_ids = random.sample(restaurant_ids, 5)
 suggested_ids = sorted(suggested_ids)
 
-df_rev_resam = pd.read_csv('df_rev_resam.csv')
-df = pd.read_csv('merged_df.csv').fillna('')
-data = load_files()
-
-pickle_file = "log_model_word_balance.pkl"
-with open(pickle_file, 'rb') as file:
-    loaded_log_model_word_balance = pickle.load(file)
-
-pickle_file = "vectorizer.pkl"
-with open(pickle_file, 'rb') as file:
-    loaded_vectorizer = pickle.load(file)
+# Số review đọc và phân loại mỗi lần khi upload file
+UPLOAD_CHUNK_SIZE = 5000
+PREVIEW_ROWS = 1000
+# Số process tiền xử lý cho mỗi lần upload, đặt nhỏ để nhiều phiên upload cùng lúc không tranh hết CPU
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '2'))
+# Kết quả upload nằm trong thư mục riêng của từng phiên, file cũ hơn UPLOAD_RESULT_TTL giây sẽ bị xóa
+UPLOAD_RESULT_DIR = os.path.join(tempfile.gettempdir(), 'review_predictions')
+UPLOAD_RESULT_TTL = 6 * 3600
+# Số process vẽ biểu đồ khi so sánh nhiều nhà hàng
+COMPARE_WORKERS = int(os.environ.get('COMPARE_WORKERS', '2'))
+# So sánh từ bao nhiêu nhà hàng thì hiện chi tiết từng nhà hàng theo tab thay vì theo cột
+COMPARE_COLUMNS = 3
+
+# Xóa kết quả upload cũ của mọi phiên (kể cả phiên đã đóng) và các thư mục phiên đã rỗng
+def sweep_upload_results():
+    if not os.path.isdir(UPLOAD_RESULT_DIR):
+        return
+    now = time.time()
+    for session_dir in os.scandir(UPLOAD_RESULT_DIR):
+        if not session_dir.is_dir():
+            continue
+        for entry in os.scandir(session_dir.path):
+            try:
+                if now - entry.stat().st_mtime > UPLOAD_RESULT_TTL:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(session_dir.path)
+        except OSError:
+            pass
+
+# Model, từ điển và dữ liệu chỉ nạp một lần cho mỗi process server, dùng chung giữa các phiên
+@st.cache_resource
+def load_resources():
+    data = load_files()
+    # Dùng model_compact.npz (python compact_model.py) nếu có, không cần nạp scikit-learn
+    loaded_vectorizer, loaded_log_model_word_balance = load_classifier()
+    return data, loaded_log_model_word_balance, loaded_vectorizer
+
+# Chỉ đọc khi vào trang Restaurant Information, và chỉ các cột cần dùng.
+# Các cột count_food/count_price/count_service nếu chưa có thì đếm từ clean_Comment
+@st.cache_resource
+def load_restaurant_data():
+    return add_aspect_counts(read_dataset('merged_df.csv', columns=MERGED_COLUMNS).fillna(''))
+
+# Số liệu tính sẵn cho từng nhà hàng (python restaurant_summary.py) và vị trí các dòng của từng nhà hàng
+@st.cache_resource
+def load_restaurant_summaries():
+    df = load_restaurant_data()
+    if is_up_to_date('restaurant_summary.pkl', 'merged_df.csv'):
+        summaries = load_summaries('restaurant_summary.pkl')
+    else:
+        summaries = build_summaries(df)
+    return summaries, df.groupby('IDRestaurant').indices
+
+# Kho review append-only (python review_store.py import/ingest). Nếu có thì dùng thay cho merged_df.csv:
+# chỉ nạp summaries, còn review của một nhà hàng chỉ đọc từ partition của nhà hàng đó khi cần
+def load_review_store():
+    store = ReviewStore('review_store')
+    return store if store.exists() else None
+
+# version đổi sau mỗi lần ingest nên summaries mới được nạp lại mà không cần khởi động lại app
+@st.cache_resource(max_entries=1)
+def load_store_summaries(version):
+    return load_review_store().load_summaries()
+
+# Ảnh word cloud và biểu đồ đã vẽ (python restaurant_charts.py để vẽ sẵn cho mọi nhà hàng)
+@st.cache_resource
+def load_image_cache():
+    return ImageCache('image_cache')
+
+data, loaded_log_model_word_balance, loaded_vectorizer = load_resources()
+pipeline = ReviewPipeline(data)
+
+# Cache dự đoán dùng chung cho mọi phiên và mọi lần chạy lại script
+@st.cache_resource
+def load_prediction_cache():
+    data, loaded_log_model_word_balance, loaded_vectorizer = load_resources()
+    namespace = prediction_namespace(loaded_log_model_word_balance, loaded_vectorizer, data)
+    return PredictionCache(maxsize=100000, db_path='prediction_cache.sqlite', namespace=namespace)
+
+prediction_cache = load_prediction_cache()
+
+def show_cache_stats():
+    stats = prediction_cache.stats()
+    st.caption(f"Prediction cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
 
 st.image('shopeefood.png', use_column_width=True)
 menu = ['Home Page', 'Review Classification', 'Restaurant Information', 'About Us']
 choice = st.sidebar.selectbox('Menu', menu)
 
+# Bảng thời gian từng bước (tiền xử lý, TF-IDF, predict, từng biểu đồ) của lần chạy này, chỉ đo khi được bật
+show_profile = st.sidebar.checkbox('Show profiling', value=profiler.enabled)
+if show_profile:
+    profiler.start_request()
+    profile_panel = st.sidebar.empty()
+    page_start = time.perf_counter()
+
 if choice == 'Home Page':
     st.markdown('''
     **ShopeeFood** is an app that provides food delivery services primarily in major cities in Vietnam. It was formerly known as the Now app before being rebranded. ShopeeFood allows users to order food from a variety of restaurants and have it delivered directly to their doorstep. The app offers a user-friendly interface, extensive merchant selections, and is designed to handle group orders efficiently.
@@ -84,14 +179,10 @@ elif choice == 'Review Classification':
         customer_review = st.text_input('Enter content of courses')
 
         if st.button('Predict'):
-            customer_review = process_text(customer_review, data['emojicon'], data['teencode'], data['wrong_words'])
-            customer_review = covert_unicode(customer_review)
-            customer_review = process_special_word(customer_review)
-            customer_review = normalize_repeated_characters(customer_review)
-            customer_review = process_postag_thesea(customer_review)
-            new_comment = loaded_vectorizer.transform([customer_review])
-            pred = loaded_log_model_word_balance.predict(new_comment)
-            st.markdown(f'**Prediction:** {pred[0]}')
+            _, pred, probability = classify_reviews([customer_review], pipeline, loaded_vectorizer, loaded_log_model_word_balance, prediction_cache)[0]
+            st.markdown(f'**Prediction:** {pred}')
+            st.markdown(f'**Confidence:** {probability:.1%}')
+            show_cache_stats()
 
     elif type == "Input multiple reviews":
         st.markdown("### Input reviews to text area ###")
@@ -105,42 +196,78 @@ elif choice == 'Review Classification':
         comment_df = comment_df[comment_df["Comment"].str.len() >= 2]
         if st.button('Predict'):
             comment_list = comment_df["Comment"].tolist()
-            comment_list = [process_text(comment, data['emojicon'], data['teencode'], data['wrong_words']) for comment in comment_list]
-            comment_list = [covert_unicode(comment) for comment in comment_list]
-            comment_list = [process_special_word(comment) for comment in comment_list]
-            comment_list = [normalize_repeated_characters(comment) for comment in comment_list]
-            comment_list = [process_postag_thesea(comment) for comment in comment_list]
-            new_comments = loaded_vectorizer.transform(comment_list)
-            preds = loaded_log_model_word_balance.predict(new_comments)
-            comment_df['Predict'] = preds
+            results = classify_reviews(comment_list, pipeline, loaded_vectorizer, loaded_log_model_word_balance, prediction_cache)
+            comment_df['Predict'] = [pred for _, pred, _ in results]
+            comment_df['Probability'] = [probability for _, _, probability in results]
             st.write(comment_df)
+            show_cache_stats()
 
     elif type == "Upload review file":
         st.markdown("###  Upload review file ###")
         uploaded_file = st.file_uploader("Please upload 'csv' or 'txt' file", type=["csv", "txt"])
 
         if uploaded_file is not None:
-            if uploaded_file.name.endswith('.csv'):
-                comment_df = pd.read_csv(uploaded_file)
+            # Streamlit chạy lại script sau mỗi thao tác, chỉ phân loại lại khi có file mới
+            result = st.session_state.get('upload_result')
+            if result is None or result['file_id'] != uploaded_file.file_id or not os.path.exists(result['path']):
+                sweep_upload_results()
+                if 'upload_session' not in st.session_state:
+                    st.session_state['upload_session'] = uuid.uuid4().hex
+                session_dir = os.path.join(UPLOAD_RESULT_DIR, st.session_state['upload_session'])
+                os.makedirs(session_dir, exist_ok=True)
+                result_path = os.path.join(session_dir, 'predictions.csv')
+
+                if uploaded_file.name.endswith('.csv'):
+                    chunks = pd.read_csv(uploaded_file, chunksize=UPLOAD_CHUNK_SIZE)
+                else:
+                    chunks = pd.read_csv(uploaded_file, delimiter="\t", header=None, names=["Comment"], chunksize=UPLOAD_CHUNK_SIZE)
+
+                progress = st.progress(0.0)
+                status = st.empty()
+                preview = st.empty()
+                preview_df = pd.DataFrame()
+                num_reviews = 0
+                # Ghi kết quả ra file tạm theo từng chunk để bộ nhớ không tăng theo kích thước file
+                with open(result_path, 'w', encoding='utf-8', newline='') as result_file:
+                    for chunk in classify_chunks(chunks, pipeline, loaded_vectorizer, loaded_log_model_word_balance, prediction_cache, workers=UPLOAD_WORKERS):
+                        chunk.to_csv(result_file, header=num_reviews == 0, index=False)
+                        num_reviews += len(chunk)
+                        if len(preview_df) < PREVIEW_ROWS:
+                            preview_df = pd.concat([preview_df, chunk.head(PREVIEW_ROWS - len(preview_df))], ignore_index=True)
+                            preview.write(preview_df)
+                        progress.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0))
+                        status.markdown(f"Classified **{num_reviews}** reviews")
+                progress.progress(1.0)
+                result = {'file_id': uploaded_file.file_id, 'path': result_path, 'num_reviews': num_reviews, 'preview': preview_df}
+                st.session_state['upload_result'] = result
+                show_cache_stats()
             else:
-                comment_df = pd.read_csv(uploaded_file, delimiter="\t", header=None, names=["Comment"])
+                st.markdown(f"Classified **{result['num_reviews']}** reviews")
+                st.write(result['preview'])
 
-            first_column_name = comment_df.columns[0]
-            comment_df.rename(columns={first_column_name: "Comment"}, inplace=True)
-
-            comment_list = comment_df["Comment"].tolist()
-            comment_list = [process_text(comment, data['emojicon'], data['teencode'], data['wrong_words']) for comment in comment_list]
-            comment_list = [covert_unicode(comment) for comment in comment_list]
-            comment_list = [process_special_word(comment) for comment in comment_list]
-            comment_list = [normalize_repeated_characters(comment) for comment in comment_list]
-            comment_list = [process_postag_thesea(comment) for comment in comment_list]
-            new_comments = loaded_vectorizer.transform(comment_list)
-            preds = loaded_log_model_word_balance.predict(new_comments)
-            comment_df['Predict'] = preds
-            st.write(comment_df)
+            if result['num_reviews'] > PREVIEW_ROWS:
+                st.markdown(f"Showing the first {PREVIEW_ROWS} reviews, download the file for all predictions.")
+            with open(result['path'], 'rb') as file:
+                st.download_button("Download predictions", file, file_name="predictions.csv", mime="text/csv")
 
 elif choice == 'Restaurant Information':
     st.subheader("Restaurant Information")
+    store = load_review_store()
+    if store is not None:
+        summaries = load_store_summaries(store.version())
+
+        # Chỉ đọc các partition chứa các nhà hàng cần xem
+        def restaurant_rows(restaurant_ids):
+            return store.read(restaurant_ids).astype(object).fillna('')
+    else:
+        df = load_restaurant_data()
+        summaries, restaurant_index = load_restaurant_summaries()
+
+        # Lấy các dòng của các nhà hàng cần xem theo vị trí, không lọc cả DataFrame
+        def restaurant_rows(restaurant_ids):
+            positions = [restaurant_index[restaurant_id] for restaurant_id in restaurant_ids if restaurant_id in restaurant_index]
+            return df.take(np.concatenate(positions)) if positions else df.iloc[:0]
+    image_cache = load_image_cache()
     type = st.radio("", options=["Search Information", "Compare Information"])
 
     if type == "Search Information":
@@ -158,44 +285,55 @@ elif choice == 'Restaurant Information':
 
         if st.button('Search'):
             try:
-                analyze_general(df, int(id))
+                analyze_general(restaurant_rows([int(id)]), int(id), summaries, None, image_cache)
             except ValueError:
                 st.error("Please enter a valid number for the Restaurant ID.")
 
     if type == "Compare Information":
         st.markdown("### Input Restaurant ID ###")
 
-        suggestion1 = st.selectbox(
-            'Choose a suggested ID 1 or "Manual Input"',
-             options=[str(id) for id in suggested_ids] + ["Manual Input"]
-        )
-        
-        if suggestion1 == "Manual Input":
-            id1 = st.text_input('Restaurant 1 ID')
-        else:
-            id1 = suggestion1
-
-        suggestion2 = st.selectbox(
-            'Choose a suggested ID 2 or "Manual Input"',
-             options=[str(id) for id in suggested_ids] + ["Manual Input"]
-        )
-        
-        if suggestion2 == "Manual Input":
-            id2 = st.text_input('Restaurant 2 ID')
-        else:
-            id2 = suggestion2
+        chosen = st.multiselect('Choose suggested IDs', options=suggested_ids, default=suggested_ids[:2])
+        other_ids = st.text_input('Other restaurant IDs (comma separated)')
 
         if st.button('Compare'):
+            # Chỉ báo lỗi đầu tiên gặp phải
+            error = None
             try:
-                col1, col2 = st.columns(2)
-
-                with col1:
-                    analyze_general(df, int(id1))
-
-                with col2:
-                    analyze_general(df, int(id2))
+                ids = list(dict.fromkeys(chosen + [int(id) for id in other_ids.replace(';', ',').split(',') if id.strip()]))
             except ValueError:
-                st.error("Please enter a valid number for the Restaurant ID.")
+                error = "Please enter valid numbers for the Restaurant IDs, separated by commas."
+            if error is None:
+                missing = [id for id in ids if id not in summaries]
+                if missing:
+                    st.warning(f"Restaurant ID not found: {', '.join(map(str, missing))}")
+                ids = [id for id in ids if id in summaries]
+                if len(ids) < 2:
+                    error = "Please choose at least two restaurants to compare."
+
+            if error is not None:
+                st.error(error)
+            else:
+                # Đọc review của mọi nhà hàng cần so sánh một lần, bảng và biểu đồ chung tính trong một lượt groupby
+                rows = restaurant_rows(ids)
+                table, yearly, aspects = compare_restaurants(rows, ids)
+                st.markdown("### Comparison ###")
+                st.dataframe(table)
+                st.markdown("Number of reviews by year")
+                st.line_chart(yearly.set_axis(yearly.index.astype(str)))
+                st.markdown("Aspect words (food, price, service)")
+                st.bar_chart(aspects, stack=False)
+
+                # Vẽ trước word cloud và biểu đồ của các nhà hàng song song (ảnh vào image_cache),
+                # streamlit chỉ hiển thị được từ thread chính nên sau đó mới hiện lần lượt từng nhà hàng
+                with profiler.stage('chart.prepare_restaurants', items=len(ids)):
+                    prepare_restaurants(ids, summaries, rows, image_cache, workers=COMPARE_WORKERS)
+                if len(ids) <= COMPARE_COLUMNS:
+                    containers = st.columns(len(ids))
+                else:
+                    containers = st.tabs([f"{id} - {summaries[id]['name']}" for id in ids])
+                for container, id in zip(containers, ids):
+                    with container:
+                        analyze_general(rows, id, summaries, None, image_cache)
 
 elif choice == 'About Us':
     st.subheader("About Us")
@@ -227,3 +365,11 @@ elif choice == 'About Us':
 
     Refer to the source code at the [GitHub link](https://github.com/26thang6/long-project3.git).
     ''')
+
+
+if show_profile:
+    profiler.record(f'page.{choice}', time.perf_counter() - page_start)
+    trace = profiler.finish_request()
+    log_trace('streamlit_run', trace, page=choice)
+    profile_df = pd.DataFrame.from_dict(trace, orient='index', columns=['calls', 'items', 'seconds'])
+    profile_panel.dataframe(profile_df.sort_values('seconds', ascending=False).style.format({'seconds': '{:.4f}'}))
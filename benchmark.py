@@ -0,0 +1,434 @@
+import argparse
+import json
+import os
+import random
+import time
+import timeit
+import tracemalloc
+import unicodedata
+import regex
+
+
+# Bản cũ của covert_unicode (tạo lại bảng và regex mỗi lần gọi), giữ lại để so sánh
+def covert_unicode_legacy(txt):
+    from pre_process import loaddicchar
+    dicchar = loaddicchar()
+    return regex.sub('|'.join(dicchar), lambda x: dicchar[x.group()], txt)
+
+
+def sample_reviews(n, seed=42):
+    words = "món ăn rất ngon giao hàng nhanh quán này đắt quá không thích chẳng ổn giá rẻ phục vụ tệ nhân viên dễ thương".split()
+    rnd = random.Random(seed)
+    reviews = []
+    for _ in range(n):
+        review = ' '.join(rnd.choice(words) for _ in range(rnd.randint(5, 40)))
+        # Khoảng 1/4 review gõ bằng unicode tổ hợp (dấu rời)
+        if rnd.random() < 0.25:
+            review = unicodedata.normalize('NFD', review)
+        reviews.append(review)
+    return reviews
+
+
+# Sinh review giả lập từ chính từ điển của repo: teencode, emoji, từ sai, dấu câu, số,
+# ký tự lặp và unicode tổ hợp, để đi qua đủ mọi nhánh của các bước tiền xử lý
+def synthetic_reviews(n, data, seed=42):
+    words = "món ăn rất ngon giao hàng nhanh quán này đắt quá không thích chẳng chả ổn giá rẻ phục vụ tệ nhân viên dễ thương".split()
+    teencode = list(data['teencode'])
+    emoji = list(data['emojicon'])
+    wrong_words = data['wrong_words']
+    extras = ['!!', '...', '12k', '’', '.', '?', 'ngonnnn', 'quáaaa', 'HÀNG', 'ok', ':)', '100%', 'abc123']
+    separators = [' ', ' ', ' ', '', '. ', '  ', ', ']
+    rnd = random.Random(seed)
+    reviews = []
+    for _ in range(n):
+        tokens = []
+        for _ in range(rnd.randint(0, 40)):
+            source = rnd.random()
+            if source < 0.55:
+                tokens.append(rnd.choice(words))
+            elif source < 0.7:
+                tokens.append(rnd.choice(teencode))
+            elif source < 0.8:
+                tokens.append(rnd.choice(emoji))
+            elif source < 0.9:
+                tokens.append(rnd.choice(wrong_words))
+            else:
+                tokens.append(rnd.choice(extras))
+            tokens.append(rnd.choice(separators))
+        review = ''.join(tokens)
+        if rnd.random() < 0.2:
+            review = unicodedata.normalize('NFD', review)
+        reviews.append(review)
+    return reviews
+
+
+# Bộ review cố định dùng để kiểm tra hồi quy (mỗi dòng một giá trị JSON, có cả giá trị không phải chuỗi)
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regression_corpus.jsonl')
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+# Kết quả chuẩn của từng bước trên CORPUS_PATH, một dòng JSON cho mỗi review
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_outputs.jsonl')
+
+
+# Các bước của đường xử lý chính, mỗi bước nhận và trả về cả danh sách:
+# 5 bước của ReviewPipeline rồi vectorize+predict trả về (label, probability)
+def pipeline_stages(data):
+    from data_loader import load_pickle, package_path
+    from pre_process import ReviewPipeline
+    model = load_pickle(package_path('log_model_word_balance.pkl'))
+    vectorizer = load_pickle(package_path('vectorizer.pkl'))
+
+    def batch_stage(stage):
+        return lambda texts: [stage(text) for text in texts]
+
+    def predict(texts):
+        matrix = vectorizer.transform(texts)
+        probabilities = model.predict_proba(matrix).max(axis=1)
+        return [(str(label), float(probability)) for label, probability in zip(model.predict(matrix), probabilities)]
+
+    stages = [(name, batch_stage(stage)) for name, stage in ReviewPipeline(data).stages]
+    stages.append(('vectorize+predict', predict))
+    return stages
+
+
+# Chạy lần lượt các bước trên corpus, trả về {tên bước: danh sách kết quả}
+def stage_outputs(stages, texts):
+    outputs = {}
+    for name, stage in stages:
+        texts = stage(texts)
+        outputs[name] = texts
+    return outputs
+
+
+def golden_rows(outputs):
+    rows = []
+    for values in zip(*outputs.values()):
+        row = dict(zip(outputs, values))
+        row['label'], row['probability'] = row.pop('vectorize+predict')
+        rows.append(row)
+    return rows
+
+
+# So sánh kết quả từng bước với GOLDEN_PATH, dừng ở review đầu tiên khác (bước sớm nhất được báo trước)
+def check_golden(stages, corpus, path=GOLDEN_PATH):
+    with open(path, encoding='utf-8') as file:
+        expected_rows = [json.loads(line) for line in file if line.strip()]
+    if len(expected_rows) != len(corpus):
+        raise SystemExit(f"{path} has {len(expected_rows)} rows but the corpus has {len(corpus)} reviews, rerun with --update")
+    rows = golden_rows(stage_outputs(stages, corpus))
+    for text, expected, actual in zip(corpus, expected_rows, rows):
+        for name in expected:
+            if name == 'probability':
+                same = abs(expected[name] - actual[name]) <= 1e-9
+            else:
+                same = expected[name] == actual[name]
+            if not same:
+                raise SystemExit(f"{name} output changed on {text!r}:\n  expected {expected[name]!r}\n  got      {actual[name]!r}\n"
+                                 f"If the change is intended, rerun: python benchmark.py golden --update")
+    return len(rows)
+
+
+def bench_golden(args):
+    from pre_process import load_files
+    stages = pipeline_stages(load_files())
+    corpus = load_corpus()
+    if args.update:
+        rows = golden_rows(stage_outputs(stages, corpus))
+        with open(GOLDEN_PATH, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        print(f"wrote {len(rows)} golden rows to {GOLDEN_PATH}")
+        return
+    print(f"golden outputs  {check_golden(stages, corpus)} reviews, every stage unchanged")
+
+
+# Thông lượng và bộ nhớ đỉnh của từng bước trên 1k/10k/100k review giả lập.
+# Mỗi bước nhận kết quả của bước trước, như trong ReviewPipeline. Bộ nhớ đo trong một lượt
+# chạy riêng với tracemalloc (làm chậm đáng kể) để không ảnh hưởng số đo thời gian.
+def bench_stages(args):
+    from pre_process import load_files
+    data = load_files()
+    stages = pipeline_stages(data)
+    if not args.skip_golden:
+        print(f"golden outputs  {check_golden(stages, load_corpus())} reviews, every stage unchanged")
+
+    for n in args.sizes:
+        texts = synthetic_reviews(n, data, seed=args.seed)
+        print(f"stages  {n} reviews")
+        print(f"  {'stage':<30} {'reviews/s':>12} {'us/review':>10} {'peak MiB':>9}")
+        total = 0.0
+        for name, stage in stages:
+            start = time.perf_counter()
+            outputs = stage(texts)
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            peak = ''
+            if not args.no_memory:
+                tracemalloc.start()
+                stage(texts)
+                peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:9.1f}"
+                tracemalloc.stop()
+            print(f"  {name:<30} {n / elapsed:12.1f} {elapsed / n * 1e6:10.1f} {peak:>9}")
+            texts = outputs
+        print(f"  {'total':<30} {n / total:12.1f} {total / n * 1e6:10.1f}")
+
+
+# Thời gian mỗi từ của process_special_word và normalize_repeated_characters trên review dài dần:
+# nếu cài đặt tuyến tính thì ns/word gần như không đổi khi số từ tăng
+def bench_linear(args):
+    import functools
+    from pre_process import load_files, ReviewPipeline
+    data = load_files()
+    stages = dict(ReviewPipeline(data).stages)
+    words = "không ngon chẳng ổn chả thích món ăn ngonnnn quáaa xoong coffeeee giá rẻ".split()
+    rnd = random.Random(args.seed)
+    print(f"review length scaling  {', '.join(str(n) for n in args.words)} words")
+    for name in ('process_special_word', 'normalize_repeated_characters'):
+        for n in args.words:
+            text = ' '.join(rnd.choice(words) for _ in range(n))
+            seconds = min(timeit.repeat(functools.partial(stages[name], text), number=1, repeat=args.repeat))
+            print(f"  {name:<30} {n:7d} words: {seconds / n * 1e9:8.1f} ns/word")
+
+
+# Model scikit-learn (pickle) so với bản rút gọn chỉ dùng NumPy: thời gian nạp trong một process mới
+# (gồm cả import) và độ trễ transform+predict theo kích thước batch
+def bench_model(args):
+    import subprocess
+    import sys
+    from data_loader import load_pickle, package_path
+    from compact_model import COMPACT_PATH, CompactModel
+    loaders = {
+        'sklearn': "from data_loader import load_pickle, package_path; "
+                   "load_pickle(package_path('vectorizer.pkl')); load_pickle(package_path('log_model_word_balance.pkl'))",
+        'compact': "from compact_model import CompactModel, COMPACT_PATH; CompactModel.load(COMPACT_PATH)",
+    }
+    print(f"model loading  (fresh process, best of {args.repeat})")
+    for name, code in loaders.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-W', 'ignore', '-c', code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            timings.append(time.perf_counter() - start)
+        print(f"  {name:<8}: {min(timings) * 1000:8.1f} ms")
+
+    vectorizer = load_pickle(package_path('vectorizer.pkl'))
+    model = load_pickle(package_path('log_model_word_balance.pkl'))
+    compact = CompactModel.load(COMPACT_PATH)
+    with open(GOLDEN_PATH, encoding='utf-8') as file:
+        texts = [json.loads(line)['process_postag_thesea'] for line in file if line.strip()]
+
+    def classify(vectorizer, model, batch):
+        matrix = vectorizer.transform(batch)
+        return model.predict(matrix), model.predict_proba(matrix).max(axis=1)
+
+    print(f"transform + predict + predict_proba  ({len(texts)} golden reviews)")
+    for batch_size in args.batch_sizes:
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        row = []
+        for name, (vec, mod) in (('sklearn', (vectorizer, model)), ('compact', (compact, compact))):
+            seconds = min(timeit.repeat(lambda: [classify(vec, mod, batch) for batch in batches], number=1, repeat=args.repeat))
+            row.append(f"{name} {seconds / len(batches) * 1000:8.3f} ms/batch")
+        for batch in batches:
+            expected, actual = classify(vectorizer, model, batch), classify(compact, compact, batch)
+            assert list(expected[0]) == list(actual[0]), 'compact model changed a label'
+        print(f"  batch {batch_size:5d}: " + ', '.join(row))
+
+
+def bench_normalize(args):
+    from pre_process import load_files, process_text, TextNormalizer
+    data = load_files()
+    corpus = load_corpus()
+    normalizer = TextNormalizer(data)
+
+    def legacy(text):
+        return process_text(text, data['emojicon'], data['teencode'], data['wrong_words'])
+
+    for text in corpus:
+        expected, actual = legacy(text), normalizer.process_text(text)
+        if expected != actual:
+            raise SystemExit(f"TextNormalizer differs from process_text on {text!r}:\n  expected {expected!r}\n  got      {actual!r}")
+
+    old = min(timeit.repeat(lambda: [legacy(text) for text in corpus], number=1, repeat=args.repeat))
+    new = min(timeit.repeat(lambda: [normalizer.process_text(text) for text in corpus], number=1, repeat=args.repeat))
+    print(f"process_text  {len(corpus)} reviews, output identical")
+    print(f"  process_text  : {old / len(corpus) * 1e6:8.2f} us/review")
+    print(f"  TextNormalizer: {new / len(corpus) * 1e6:8.2f} us/review")
+    print(f"  speedup       : {old / new:8.1f}x")
+
+
+# Thông lượng của ReviewPipeline.run (đường upload và CLI) theo số process
+def bench_scaling(args):
+    from pre_process import load_files, ReviewPipeline
+    data = load_files()
+    reviews = synthetic_reviews(args.n, data)
+    pipeline = ReviewPipeline(data)
+    print(f"ReviewPipeline.run  {args.n} reviews, {os.cpu_count()} cores available")
+    baseline = expected = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        outputs = list(pipeline.run(reviews, workers=workers))
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            baseline, expected = elapsed, outputs
+        assert outputs == expected, f"workers={workers} changed the output or its order"
+        print(f"  workers {workers:2d}: {args.n / elapsed:8.1f} reviews/s, speedup {baseline / elapsed:5.2f}x")
+
+
+def bench_unicode(args):
+    from pre_process import covert_unicode
+    reviews = sample_reviews(args.n)
+    assert [covert_unicode(r) for r in reviews] == [covert_unicode_legacy(r) for r in reviews]
+
+    old = min(timeit.repeat(lambda: [covert_unicode_legacy(r) for r in reviews], number=1, repeat=args.repeat))
+    new = min(timeit.repeat(lambda: [covert_unicode(r) for r in reviews], number=1, repeat=args.repeat))
+    print(f"covert_unicode  {args.n} reviews")
+    print(f"  legacy : {old / args.n * 1e6:8.2f} us/review")
+    print(f"  current: {new / args.n * 1e6:8.2f} us/review")
+    print(f"  speedup: {old / new:8.1f}x")
+
+
+# Các entry point đo thời gian import bằng `python -X importtime -c "import <tên>"`.
+# 'app' là các dòng import ở đầu app.py (chạy app.py thật cần streamlit server).
+IMPORT_TARGETS = ['pre_process', 'compact_model', 'serve', 'review_store', 'app']
+HEAVY_MODULES = ['pandas', 'streamlit', 'matplotlib', 'wordcloud', 'nltk', 'underthesea', 'sklearn']
+
+
+def import_code(target, directory):
+    if target != 'app':
+        return f'import {target}'
+    import ast
+    with open(os.path.join(directory, 'app.py'), encoding='utf-8') as file:
+        tree = ast.parse(file.read())
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+# Tổng thời gian import (ms, cộng cột self của -X importtime) và các module nặng đã bị import
+def import_time(code, directory):
+    import subprocess
+    import sys
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', code],
+                            cwd=directory, capture_output=True, text=True, check=True)
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        total += int(self_us)
+        modules.add(name.strip())
+    return total / 1000, [module for module in HEAVY_MODULES if module in modules]
+
+
+def bench_importtime(args):
+    import subprocess
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    trees = [('current', here)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.against:
+            # Bản code của một commit khác (chỉ các file .py) để so sánh
+            files = subprocess.run(['git', 'ls-tree', '--name-only', args.against], cwd=here,
+                                   capture_output=True, text=True, check=True).stdout.split()
+            for name in files:
+                if name.endswith('.py'):
+                    source = subprocess.run(['git', 'show', f'{args.against}:{name}'], cwd=here,
+                                            capture_output=True, check=True).stdout
+                    with open(os.path.join(tmp_dir, name), 'wb') as file:
+                        file.write(source)
+            trees.insert(0, (args.against, tmp_dir))
+
+        print(f"import time (best of {args.repeat}, python -X importtime)")
+        for target in args.targets:
+            results = []
+            for label, directory in trees:
+                code = import_code(target, directory)
+                timings = [import_time(code, directory) for _ in range(args.repeat)]
+                results.append(min(timings))
+                total, heavy = min(timings)
+                print(f"  {target:<14} {label:<10}: {total:8.1f} ms  heavy: {', '.join(heavy) or '-'}")
+            if len(results) == 2:
+                print(f"  {target:<14} {'saved':<10}: {results[0][0] - results[1][0]:8.1f} ms")
+
+
+# Chạy app.py bằng AppTest của streamlit: lần chạy đầu (cold start, gồm cả import) và các lần rerun.
+# AppTest chạy script ngay trong process này, không phải process mới. benchmark.py không import module nào
+# của app ở đầu file nên cold start vẫn gồm thời gian import của chúng, trừ streamlit (đã import cùng AppTest).
+def bench_startup(args):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.abspath(args.script), default_timeout=args.timeout)
+    timings = []
+
+    def timed(label, action):
+        start = time.perf_counter()
+        action()
+        timings.append((label, time.perf_counter() - start))
+
+    timed('cold start (Home Page)', at.run)
+    timed('rerun (Home Page)', at.run)
+    for page in ('Review Classification', 'Restaurant Information'):
+        timed(f'open {page}', lambda: at.sidebar.selectbox[0].select(page).run())
+        timed(f'rerun {page}', at.run)
+
+    print(f"app startup  {args.script}")
+    for label, seconds in timings:
+        print(f"  {label:<36}: {seconds * 1000:9.1f} ms")
+    for exception in at.exception:
+        print(f"  error: {exception.message}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for pre_process')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    unicode_parser = subparsers.add_parser('unicode', help='covert_unicode vs the legacy implementation')
+    unicode_parser.add_argument('-n', type=int, default=10000)
+    unicode_parser.add_argument('--repeat', type=int, default=3)
+    unicode_parser.set_defaults(func=bench_unicode)
+
+    normalize_parser = subparsers.add_parser('normalize', help='TextNormalizer vs process_text on the regression corpus')
+    normalize_parser.add_argument('--repeat', type=int, default=3)
+    normalize_parser.set_defaults(func=bench_normalize)
+
+    scaling_parser = subparsers.add_parser('scaling', help='preprocessing throughput by number of worker processes')
+    scaling_parser.add_argument('-n', type=int, default=50000)
+    scaling_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    scaling_parser.set_defaults(func=bench_scaling)
+
+    linear_parser = subparsers.add_parser('linear', help='per-word cost of process_special_word and normalize_repeated_characters on long reviews')
+    linear_parser.add_argument('--words', type=int, nargs='+', default=[1000, 10000, 100000])
+    linear_parser.add_argument('--seed', type=int, default=42)
+    linear_parser.add_argument('--repeat', type=int, default=5)
+    linear_parser.set_defaults(func=bench_linear)
+
+    model_parser = subparsers.add_parser('model', help='load time and batch latency of the sklearn model vs model_compact.npz')
+    model_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 64, 1024])
+    model_parser.add_argument('--repeat', type=int, default=3)
+    model_parser.set_defaults(func=bench_model)
+
+    stages_parser = subparsers.add_parser('stages', help='per-stage throughput and peak memory of preprocessing and prediction')
+    stages_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    stages_parser.add_argument('--seed', type=int, default=42)
+    stages_parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    stages_parser.add_argument('--skip-golden', action='store_true', help='skip the golden output check')
+    stages_parser.set_defaults(func=bench_stages)
+
+    golden_parser = subparsers.add_parser('golden', help='check every stage against golden_outputs.jsonl')
+    golden_parser.add_argument('--update', action='store_true', help='rewrite the golden file after an intended change')
+    golden_parser.set_defaults(func=bench_golden)
+
+    importtime_parser = subparsers.add_parser('importtime', help='cold import time of each entry point (python -X importtime)')
+    importtime_parser.add_argument('--targets', nargs='+', default=IMPORT_TARGETS)
+    importtime_parser.add_argument('--against', help='also measure the .py files of this git revision, e.g. HEAD~1')
+    importtime_parser.add_argument('--repeat', type=int, default=3)
+    importtime_parser.set_defaults(func=bench_importtime)
+
+    startup_parser = subparsers.add_parser('startup', help='cold start and rerun latency of the streamlit app')
+    startup_parser.add_argument('--script', default='app.py')
+    startup_parser.add_argument('--timeout', type=float, default=300)
+    startup_parser.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,128 @@
+import argparse
+import hashlib
+import os
+import re
+import numpy as np
+from data_loader import load_pickle, package_path
+
+COMPACT_PATH = package_path('model_compact.npz')
+MODEL_PATH = package_path('log_model_word_balance.pkl')
+VECTORIZER_PATH = package_path('vectorizer.pkl')
+
+
+# Bản rút gọn của CountVectorizer + LogisticRegression (2 lớp) chỉ cần NumPy, không import scikit-learn:
+# từ điển là mảng các từ (vị trí = cột), hệ số là vector float32. Dùng được ở cả chỗ của vectorizer
+# và model: transform() trả về các cặp (dòng, cột) của từng từ, predict/predict_proba tính từ đó.
+class CompactModel:
+    def __init__(self, terms, coef, intercept, classes, token_pattern, lowercase=True, source=''):
+        self.terms = list(terms)
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.token_pattern = token_pattern
+        self.lowercase = lowercase
+        self.source = source
+        self.index = {term: i for i, term in enumerate(self.terms)}
+        self.tokenizer = re.compile(token_pattern)
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, model, source=''):
+        if len(model.classes_) != 2 or vectorizer.get_params()['analyzer'] != 'word' or vectorizer.ngram_range != (1, 1):
+            raise ValueError('only a binary model on a unigram word CountVectorizer can be exported')
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, i in vectorizer.vocabulary_.items():
+            terms[i] = term
+        return cls(terms, model.coef_[0], model.intercept_[0], model.classes_, vectorizer.token_pattern,
+                   vectorizer.lowercase, source)
+
+    def save(self, path):
+        np.savez_compressed(path, terms=np.frombuffer('\n'.join(self.terms).encode('utf-8'), dtype=np.uint8),
+                            coef=self.coef, intercept=np.float64(self.intercept), classes=np.array(self.classes_, dtype=str),
+                            token_pattern=np.array(self.token_pattern), lowercase=np.bool_(self.lowercase),
+                            source=np.array(self.source))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as file:
+            terms = file['terms'].tobytes().decode('utf-8').split('\n')
+            return cls(terms, file['coef'], file['intercept'], file['classes'], str(file['token_pattern']),
+                       bool(file['lowercase']), str(file['source']))
+
+    # Giống CountVectorizer.transform nhưng chỉ trả về (số review, dòng, cột) của các từ có trong từ điển
+    def transform(self, texts):
+        rows, columns = [], []
+        index, tokenizer = self.index, self.tokenizer
+        for row, text in enumerate(texts):
+            if self.lowercase:
+                text = text.lower()
+            for token in tokenizer.findall(text):
+                column = index.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        return len(texts), np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+
+    def decision_function(self, matrix):
+        num_rows, rows, columns = matrix
+        # Cộng dồn bằng float64 như scikit-learn, chỉ hệ số được lưu ở float32
+        weights = self.coef[columns].astype(np.float64)
+        return np.bincount(rows, weights=weights, minlength=num_rows) + self.intercept
+
+    def predict(self, matrix):
+        return self.classes_[(self.decision_function(matrix) > 0).astype(int)]
+
+    def predict_proba(self, matrix):
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(matrix)))
+        return np.column_stack([1.0 - positive, positive])
+
+
+def files_sha1(*paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+# Trả về (vectorizer, model): bản rút gọn nếu đã được export từ đúng hai file pickle hiện tại,
+# ngược lại nạp pickle của scikit-learn
+def load_classifier(model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH, compact_path=COMPACT_PATH):
+    if compact_path and os.path.exists(compact_path):
+        compact = CompactModel.load(compact_path)
+        if compact.source == files_sha1(model_path, vectorizer_path):
+            return compact, compact
+    return load_pickle(vectorizer_path), load_pickle(model_path)
+
+
+# So sánh với model gốc trên các review đã tiền xử lý: label phải trùng hoàn toàn
+def verify(compact, vectorizer, model, texts):
+    matrix = vectorizer.transform(texts)
+    expected_labels, expected_probabilities = model.predict(matrix), model.predict_proba(matrix).max(axis=1)
+    compact_matrix = compact.transform(texts)
+    labels, probabilities = compact.predict(compact_matrix), compact.predict_proba(compact_matrix).max(axis=1)
+    mismatches = [text for text, expected, label in zip(texts, expected_labels, labels) if expected != label]
+    return mismatches, float(np.abs(expected_probabilities - probabilities).max()) if len(texts) else 0.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the sklearn vectorizer and model to a NumPy-only compact model')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--vectorizer', default=VECTORIZER_PATH)
+    parser.add_argument('-o', '--output', default=COMPACT_PATH)
+    args = parser.parse_args()
+
+    import json
+    from benchmark import GOLDEN_PATH, synthetic_reviews
+    vectorizer, model = load_pickle(args.vectorizer), load_pickle(args.model)
+    compact = CompactModel.from_sklearn(vectorizer, model, source=files_sha1(args.model, args.vectorizer))
+
+    # Review đã tiền xử lý của bộ golden, cộng review giả lập dùng thẳng từ điển của vectorizer
+    with open(GOLDEN_PATH, encoding='utf-8') as file:
+        texts = [json.loads(line)['process_postag_thesea'] for line in file if line.strip()]
+    texts += synthetic_reviews(20000, {'teencode': compact.terms, 'emojicon': compact.terms, 'wrong_words': compact.terms})
+    mismatches, max_difference = verify(compact, vectorizer, model, texts)
+    if mismatches:
+        raise SystemExit(f"compact model disagrees with {args.model} on {len(mismatches)} reviews, e.g. {mismatches[0]!r}")
+    compact.save(args.output)
+    print(f"{len(compact.terms)} terms -> {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB), "
+          f"labels identical on {len(texts)} reviews, max probability difference {max_difference:.2e}")
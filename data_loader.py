@@ -0,0 +1,77 @@
+import argparse
+import os
+import pickle
+
+# Các cột của merged_df.csv mà app thực sự dùng
+MERGED_COLUMNS = ['IDRestaurant', 'Restaurant', 'Address', 'Time', 'Price', 'Rating',
+                  'label', 'clean_Comment', 'date', 'count_food', 'count_price', 'count_service']
+
+# Thư mục chứa code, model và các file từ điển, để các lệnh chạy được từ thư mục bất kỳ
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def package_path(file_name):
+    return os.path.join(PACKAGE_DIR, file_name)
+
+
+def load_pickle(file_path):
+    with open(file_path, 'rb') as file:
+        return pickle.load(file)
+
+
+def converted_path(csv_path, fmt):
+    return os.path.splitext(csv_path)[0] + '.' + fmt
+
+
+# Đọc dataset, ưu tiên bản parquet/feather nếu đã được convert và mới hơn file csv.
+# columns: chỉ đọc các cột này (bỏ qua cột không có trong file)
+# pandas chỉ import khi đọc dữ liệu, để compact_model và serve.py (chỉ cần package_path/load_pickle) khởi động nhanh
+def read_dataset(csv_path, columns=None):
+    import pandas as pd
+    for fmt in ('parquet', 'feather'):
+        path = converted_path(csv_path, fmt)
+        if not os.path.exists(path):
+            continue
+        if os.path.exists(csv_path) and os.path.getmtime(path) < os.path.getmtime(csv_path):
+            continue
+        # Đọc schema trước để chỉ lấy các cột có trong file
+        import pyarrow.ipc
+        import pyarrow.parquet
+        if fmt == 'parquet':
+            names = pyarrow.parquet.read_schema(path).names
+        else:
+            names = pyarrow.ipc.open_file(path).schema.names
+        selected = names if columns is None else [name for name in names if name in columns]
+        if fmt == 'parquet':
+            return pd.read_parquet(path, columns=selected)
+        return pd.read_feather(path, columns=selected)
+
+    if columns is None:
+        return pd.read_csv(csv_path)
+    return pd.read_csv(csv_path, usecols=lambda name: name in columns)
+
+
+# Convert một file csv sang parquet/feather (cần cài pyarrow)
+def convert_dataset(csv_path, fmt='parquet'):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise SystemExit('pyarrow is required to convert datasets: pip install pyarrow')
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    path = converted_path(csv_path, fmt)
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the review datasets to a faster columnar format')
+    parser.add_argument('csv_files', nargs='*', default=['merged_df.csv', 'df_rev_resam.csv'])
+    parser.add_argument('--format', choices=['parquet', 'feather'], default='parquet')
+    args = parser.parse_args()
+
+    for csv_path in args.csv_files:
+        print(f'{csv_path} -> {convert_dataset(csv_path, args.format)}')
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from benchmark import sample_reviews
+
+
+async def post(reader, writer, host, body):
+    writer.write(f"POST /predict HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status.split(b' ', 2)[1] == b'200'
+
+
+# Mỗi client giữ một kết nối keep-alive và gửi lần lượt các request lấy từ hàng đợi chung
+async def client(args, payloads, latencies, errors):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while payloads:
+            body = payloads.pop()
+            start = time.perf_counter()
+            ok = await post(reader, writer, args.host, body)
+            latencies.append(time.perf_counter() - start)
+            errors[0] += not ok
+    finally:
+        writer.close()
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method='inclusive')[p - 1] if len(values) > 1 else values[0]
+
+
+async def main(args):
+    reviews = sample_reviews(args.requests * args.bulk, seed=args.seed)
+    payloads = []
+    for i in range(args.requests):
+        batch = reviews[i * args.bulk:(i + 1) * args.bulk]
+        payload = {'review': batch[0]} if args.bulk == 1 else {'reviews': batch}
+        payloads.append(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+    latencies, errors = [], [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, payloads, latencies, errors) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} requests x {args.bulk} reviews, concurrency {args.concurrency}, {errors[0]} errors")
+    print(f"  throughput: {args.requests / elapsed:8.1f} req/s, {args.requests * args.bulk / elapsed:8.1f} reviews/s")
+    print(f"  latency   : p50 {percentile(latencies, 50) * 1000:.1f} ms, p90 {percentile(latencies, 90) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load generator for serve.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--bulk', type=int, default=1, help='reviews per request')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args))
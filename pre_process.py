@@ -1,136 +1,37 @@
-import pandas as pd
-import streamlit as st
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
+import argparse
+import contextlib
+import functools
+import itertools
+import json
+import os
 import re
+import shutil
+import time
 import regex
-from nltk.tokenize import sent_tokenize
-from underthesea import pos_tag, word_tokenize
-import nltk
-nltk.download('punkt')
-
-def analyze_general(df, restaurant_id):
-    # Filter the data for the given restaurant ID
-    restaurant_data = df[df['IDRestaurant'] == restaurant_id]
-    
-    if restaurant_data.empty:
-        st.error("Restaurant ID not found.")
-        return
-    
-    # Extract basic information
-    if restaurant_data['Restaurant'].isna().any() or restaurant_data['Address'].isna().any() or \
-       restaurant_data['Time'].isna().any() or restaurant_data['Price'].isna().any():
-        st.error("This restaurant does not have enough basic information to show detailed data.")
-        return
-    
-    name = restaurant_data['Restaurant'].iloc[0]
-    address = restaurant_data['Address'].iloc[0]
-    time = restaurant_data['Time'].iloc[0]
-    price = restaurant_data['Price'].iloc[0]
-    average_rating = round(restaurant_data['Rating'].mean(), 2)
-    
-    st.markdown(f"**Name:** {name}")
-    st.markdown(f"**Address:** {address}")
-    st.markdown(f"**Opening time:** {time}")
-    st.markdown(f"**Price:** {price}")
-    st.markdown(f"**Rating:** {average_rating} ⭐")
-    
-    # Analyze reviews
-    positive_reviews = restaurant_data[restaurant_data['label'] == 'positive']
-    negative_reviews = restaurant_data[restaurant_data['label'] == 'negative']
-    
-    num_positive_reviews = len(positive_reviews)
-    num_negative_reviews = len(negative_reviews)
-    
-    st.markdown(f"**Number of Positive Reviews:** {num_positive_reviews}")
-    st.markdown(f"**Number of Negative Reviews:** {num_negative_reviews}")
-    
-    if num_positive_reviews == 0 and num_negative_reviews == 0:
-        st.error("This restaurant does not have enough review data to show detailed analysis.")
-        return
-
-    # Generate word clouds
-    if not positive_reviews['clean_Comment'].empty:
-        positive_text = " ".join(positive_reviews['clean_Comment'])
-        wordcloud_positive = WordCloud(width=700, height=400, background_color='white').generate(positive_text)
-        st.write("<div style='text-align: center; font-size: 14px; font-weight: bold;'>Positive Reviews Word Cloud</div>", unsafe_allow_html=True)
-        st.image(wordcloud_positive.to_array(), use_column_width=True)
-    
-    if not negative_reviews['clean_Comment'].empty:
-        negative_text = " ".join(negative_reviews['clean_Comment'])
-        wordcloud_negative = WordCloud(width=700, height=400, background_color='black').generate(negative_text)
-        st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-        st.write("<div style='text-align: center; font-size: 14px; font-weight: bold;'>Negative Reviews Word Cloud</div>", unsafe_allow_html=True)
-        st.image(wordcloud_negative.to_array(), use_column_width=True)
-
-    # Generate bar charts for reviews by year and month
-    if 'date' in restaurant_data.columns:
-        restaurant_data['Year'] = pd.to_datetime(restaurant_data['date']).dt.year
-        restaurant_data['Month'] = pd.to_datetime(restaurant_data['date']).dt.month
-        
-        yearly_reviews = restaurant_data.groupby(['Year', 'label']).size().unstack(fill_value=0)
-        monthly_reviews = restaurant_data.groupby(['Month', 'label']).size().unstack(fill_value=0)
-        
-        if not yearly_reviews.empty:
-            st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-            fig, ax = plt.subplots(figsize=(10, 4))
-            yearly_reviews.plot(kind='bar', ax=ax)
-            ax.set_xlabel('')
-            ax.set_ylabel('')
-            ax.set_title('Number of Reviews by Year', fontsize=10, loc='center')
-            plt.xticks(rotation=0)  # Ensure x-axis labels are horizontal
-            st.pyplot(fig)
-        
-        if not monthly_reviews.empty:
-            st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-            fig, ax = plt.subplots(figsize=(10, 4))
-            monthly_reviews.plot(kind='bar', ax=ax)
-            ax.set_xlabel('')
-            ax.set_ylabel('')
-            ax.set_title('Number of Reviews by Month', fontsize=10, loc='center')
-            plt.xticks(rotation=0)  # Ensure x-axis labels are horizontal
-            st.pyplot(fig)
-        
-        # Generate bar chart for review relating to food by year
-        if 'count_food' in restaurant_data.columns:
-            yearly_food_reviews = restaurant_data.groupby(['Year', 'label'])['count_food'].sum().unstack(fill_value=0)
-            if not yearly_food_reviews.empty:
-                st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-                fig, ax = plt.subplots(figsize=(10, 4))
-                yearly_food_reviews.plot(kind='bar', ax=ax)
-                ax.set_xlabel('')
-                ax.set_ylabel('')
-                ax.set_title('Number of Words Related to FOOD in Reviews by Year', fontsize=10, loc='center')
-                plt.xticks(rotation=0)  # Ensure x-axis labels are horizontal
-                st.pyplot(fig)
-        
-        # Generate bar chart for review relating to price by year
-        if 'count_price' in restaurant_data.columns:
-            yearly_price_reviews = restaurant_data.groupby(['Year', 'label'])['count_price'].sum().unstack(fill_value=0)
-            if not yearly_price_reviews.empty:
-                st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-                fig, ax = plt.subplots(figsize=(10, 4))
-                yearly_price_reviews.plot(kind='bar', ax=ax)
-                ax.set_xlabel('')
-                ax.set_ylabel('')
-                ax.set_title('Number of Words Related to PRICE in Reviews by Year', fontsize=10, loc='center')
-                plt.xticks(rotation=0)  # Ensure x-axis labels are horizontal
-                st.pyplot(fig)
-        
-        # Generate bar chart for review relating to service by year
-        if 'count_service' in restaurant_data.columns:
-            yearly_service_reviews = restaurant_data.groupby(['Year', 'label'])['count_service'].sum().unstack(fill_value=0)
-            if not yearly_service_reviews.empty:
-                st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
-                fig, ax = plt.subplots(figsize=(10, 4))
-                yearly_service_reviews.plot(kind='bar', ax=ax)
-                ax.set_xlabel('')
-                ax.set_ylabel('')
-                ax.set_title('Number of Words Related to SERVICE in Reviews by Year', fontsize=10, loc='center')
-                plt.xticks(rotation=0)  # Ensure x-axis labels are horizontal
-                st.pyplot(fig)
-
-
+from concurrent.futures import ProcessPoolExecutor
+from data_loader import package_path
+from profiling import profiler
+
+# nltk và underthesea (kèm model của nó) nạp mất vài giây, nên chỉ import ở lần đầu cần tách câu/tách từ.
+# Phần giao diện (analyze_general) nằm trong restaurant_view, để CLI, serve.py và worker không cần streamlit
+@functools.lru_cache(maxsize=None)
+def load_nltk():
+    import nltk
+    # Chỉ tải punkt khi máy chưa có
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize
+
+def sent_tokenize(text):
+    return load_nltk()(text)
+
+@functools.lru_cache(maxsize=None)
+def load_underthesea():
+    from underthesea import pos_tag, word_tokenize
+    return pos_tag, word_tokenize
 
 def load_file(file_path):
     with open(file_path, 'r', encoding='utf8') as file:
@@ -145,15 +46,19 @@ def load_files():
         'teencode': 'teencode.txt',
         'english_vnmese': 'english-vnmese.txt',
         'wrong_words': 'wrong-word.txt',
-        'stopwords': 'vietnamese-stopwords.txt'
+        'stopwords': 'vietnamese-stopwords.txt',
+        'negation_words': 'negation-word.txt',
+        'doubled_words': 'doubled-word.txt'
     }
 
     data = {}
-    data['emojicon'] = process_key_value_list(load_file(files['emojicon']))
-    data['teencode'] = process_key_value_list(load_file(files['teencode']))
-    data['english_vnmese'] = process_key_value_list(load_file(files['english_vnmese']))
-    data['wrong_words'] = [word for word in load_file(files['wrong_words']) if word.strip()]
-    data['stopwords'] = [word for word in load_file(files['stopwords']) if word.strip()]
+    data['emojicon'] = process_key_value_list(load_file(package_path(files['emojicon'])))
+    data['teencode'] = process_key_value_list(load_file(package_path(files['teencode'])))
+    data['english_vnmese'] = process_key_value_list(load_file(package_path(files['english_vnmese'])))
+    data['wrong_words'] = [word for word in load_file(package_path(files['wrong_words'])) if word.strip()]
+    data['stopwords'] = [word for word in load_file(package_path(files['stopwords'])) if word.strip()]
+    data['negation_words'] = [word.strip() for word in load_file(package_path(files['negation_words'])) if word.strip()]
+    data['doubled_words'] = [word.strip() for word in load_file(package_path(files['doubled_words'])) if word.strip()]
 
     return data
 
@@ -189,6 +94,45 @@ def process_text(text, emoji_dict, teen_dict, wrong_lst):
 
 
 
+# Bản biên dịch sẵn của process_text: tạo một lần từ kết quả load_files()
+# rồi dùng lại cho mọi review, kết quả giống hệt process_text
+class TextNormalizer:
+    word_pattern = regex.compile(r'(?i)\b[a-záàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệóòỏõọôốồổỗộơớờởỡợíìỉĩịúùủũụưứừửữựýỳỷỹỵđ]+\b')
+    dots_pattern = regex.compile(r'\.+')
+    space_pattern = regex.compile(r'\s+')
+
+    def __init__(self, data):
+        # process_text duyệt từng ký tự nên chỉ các emoji 1 ký tự mới được thay
+        self.emoji_table = {ord(key): value + ' ' for key, value in data['emojicon'].items() if len(key) == 1}
+        self.teen_dict = dict(data['teencode'])
+        self.wrong_words = frozenset(data['wrong_words'])
+
+    def process_sentence(self, sentence):
+        ###### CONVERT EMOJICON
+        sentence = sentence.translate(self.emoji_table)
+        ###### CONVERT TEENCODE
+        teen_dict = self.teen_dict
+        sentence = ' '.join([teen_dict.get(word, word) for word in sentence.split()])
+        ###### DEL Punctuation & Numbers
+        words = self.word_pattern.findall(sentence)
+        ###### DEL wrong words
+        wrong_words = self.wrong_words
+        return ' '.join(['' if word in wrong_words else word for word in words])
+
+    def process_text(self, text):
+        if not isinstance(text, str):
+            text = str(text)
+        document = text.lower()
+        document = document.replace("’",'')
+        document = self.dots_pattern.sub(".", document)
+        document = ''.join([self.process_sentence(sentence) + '. ' for sentence in sent_tokenize(document)])
+        ###### DEL excess blank space
+        return self.space_pattern.sub(' ', document).strip()
+
+    __call__ = process_text
+
+
+
 # Chuẩn hóa unicode tiếng việt
 def loaddicchar():
     uniChars = "àáảãạâầấẩẫậăằắẳẵặèéẻẽẹêềếểễệđìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵÀÁẢÃẠÂẦẤẨẪẬĂẰẮẲẴẶÈÉẺẼẸÊỀẾỂỄỆĐÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴÂĂĐÔƠƯ"
@@ -203,64 +147,384 @@ def loaddicchar():
         dic[char1252[i]] = charutf8[i]
     return dic
 
+# Bảng chuyển đổi chỉ tạo một lần khi import
+dicchar = loaddicchar()
+unicode_pattern = re.compile('|'.join(dicchar))
+# Các dấu rời (combining marks) xuất hiện trong bảng, dùng để bỏ qua nhanh các câu đã chuẩn
+unicode_marks = frozenset(char[1:] for char in dicchar)
+
 # Đưa toàn bộ dữ liệu qua hàm này để chuẩn hóa lại
 def covert_unicode(txt):
-    dicchar = loaddicchar()
-    return regex.sub(
-        r'à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ',
-        lambda x: dicchar[x.group()], txt)
+    if unicode_marks.isdisjoint(txt):
+        return txt
+    return unicode_pattern.sub(lambda x: dicchar[x.group()], txt)
 
+# Chuẩn hóa lần lượt từng review của một iterable, trả về generator
+def covert_unicode_batch(texts):
+    for txt in texts:
+        yield covert_unicode(txt)
 
 
 
-def process_special_word(text):
-    # có thể có nhiều từ đặc biệt cần ráp lại với nhau
-    new_text = ''
-    text_lst = text.split()
-    i= 0
-    # không, chẳng, chả...
-    if 'không' in text_lst:
-        while i <= len(text_lst) - 1:
-            word = text_lst[i]
-            #print(word)
-            #print(i)
-            if  word == 'không':
-                next_idx = i+1
-                if next_idx <= len(text_lst) -1:
-                    word = word +'_'+ text_lst[next_idx]
-                i= next_idx + 1
-            else:
-                i = i+1
-            new_text = new_text + word + ' '
-    else:
-        new_text = text
-    return new_text.strip()
-
 
+# Các từ phủ định được ráp với từ đứng sau (không ngon -> không_ngon), đọc từ negation-word.txt
+NEGATION_WORDS = frozenset(['không'])
 
+def process_special_word(text, negation_words=NEGATION_WORDS):
+    # có thể có nhiều từ đặc biệt cần ráp lại với nhau
+    text_lst = text.split()
+    if negation_words.isdisjoint(text_lst):
+        return text.strip()
+    # Duyệt một lượt và nối bằng join ở cuối, không cộng dồn chuỗi
+    new_words = []
+    i = 0
+    while i < len(text_lst):
+        word = text_lst[i]
+        if word in negation_words and i + 1 < len(text_lst):
+            word = word + '_' + text_lst[i + 1]
+            i += 1
+        new_words.append(word)
+        i += 1
+    return ' '.join(new_words)
+
+
+
+repeat_pattern = re.compile(r'(.)\1+')
+run_pattern = re.compile(r'(.)\1*')
+# Một từ có ký tự lặp (không tính dấu gạch dưới của từ ghép), hoặc một chuỗi ký tự không phải chữ lặp lại
+repeated_word_pattern = re.compile(r'[^\W_]*?([^\W_])\1[^\W_]*|([\W_])\2+')
+
+# Độ dài từng đoạn ký tự giống nhau liên tiếp: "coffee" -> [1, 1, 2, 2]
+def run_lengths(word):
+    return [len(match.group()) for match in run_pattern.finditer(word)]
+
+# {dạng đã bỏ ký tự lặp: (từ gốc, độ dài các đoạn)} của các từ trong doubled-word.txt, ví dụ "fedback" -> feedback
+@functools.lru_cache(maxsize=16)
+def doubled_word_map(keep_words):
+    return {repeat_pattern.sub(r'\1', word): (word, run_lengths(word)) for word in keep_words}
 
 # Hàm để chuẩn hóa các từ có ký tự lặp
-def normalize_repeated_characters(text):
+# keep_words: các từ có chữ cái đôi hợp lệ (xoong, coffee...), đọc từ doubled-word.txt, được giữ nguyên
+def normalize_repeated_characters(text, keep_words=frozenset()):
     # Thay thế mọi ký tự lặp liên tiếp bằng một ký tự đó
     # Ví dụ: "ngonnnn" thành "ngon", "thiệtttt" thành "thiệt"
-    return re.sub(r'(.)\1+', r'\1', text)
+    if not keep_words:
+        return repeat_pattern.sub(r'\1', text)
+    keep_map = doubled_word_map(frozenset(keep_words))
+
+    def normalize_word(match):
+        word = match.group()
+        if word in keep_words:
+            return word
+        collapsed = repeat_pattern.sub(r'\1', word)
+        # Từ bị kéo dài ("coffeeee", "feedbackkk", "sorryyy") trở về từ gốc nếu vẫn giữ đủ các chữ cái đôi của nó,
+        # còn "xongggg" không có "oo" nên vẫn là "xong" chứ không thành "xoong"
+        kept = keep_map.get(collapsed)
+        if kept is not None and all(length >= kept_length for length, kept_length in zip(run_lengths(word), kept[1])):
+            return kept[0]
+        return collapsed
+
+    # Chỉ gọi hàm Python cho các từ có ký tự lặp
+    return repeated_word_pattern.sub(normalize_word, text)
+
 
 
+POSTAG_WORD_TYPES = frozenset(['N','Np','A','AB','V','VB','VY','R'])
 
-def process_postag_thesea(text):
-    new_document = ''
+def process_postag_thesea(text, negation_words=NEGATION_WORDS):
+    pos_tag, word_tokenize = load_underthesea()
+    new_sentences = []
     for sentence in sent_tokenize(text):
         sentence = sentence.replace('.','')
         ###### POS tag
-        lst_word_type = ['N','Np','A','AB','V','VB','VY','R']
         # lst_word_type = ['A','AB','V','VB','VY','R']
-        sentence = ' '.join( word[0] if word[1].upper() in lst_word_type else '' for word in pos_tag(process_special_word(word_tokenize(sentence, format="text"))))
-        new_document = new_document + sentence + ' '
+        sentence = ' '.join(word[0] if word[1].upper() in POSTAG_WORD_TYPES else '' for word in pos_tag(process_special_word(word_tokenize(sentence, format="text"), negation_words)))
+        new_sentences.append(sentence)
+    new_document = ' '.join(new_sentences)
     ###### DEL excess blank space
     new_document = regex.sub(r'\s+', ' ', new_document).strip()
     return new_document
 
 
 
-
-               
+# Nạp sẵn nltk và model của underthesea (chạy thử một câu)
+def init_postag_worker():
+    process_postag_thesea('khởi động')
+
+# Chạy cả 5 bước tiền xử lý cho từng review trong một lượt (generator),
+# đồng thời cộng dồn thời gian và số lần gọi của từng bước
+class ReviewPipeline:
+    def __init__(self, data):
+        normalizer = TextNormalizer(data)
+        negation_words = frozenset(data.get('negation_words', NEGATION_WORDS))
+        doubled_words = frozenset(data.get('doubled_words', ()))
+        self.stages = [
+            ('process_text', normalizer.process_text),
+            ('covert_unicode', covert_unicode),
+            ('process_special_word', functools.partial(process_special_word, negation_words=negation_words)),
+            ('normalize_repeated_characters', functools.partial(normalize_repeated_characters, keep_words=doubled_words)),
+            ('process_postag_thesea', functools.partial(process_postag_thesea, negation_words=negation_words)),
+        ]
+        self.executor = None
+        self.workers = 1
+        self.reset_stats()
+
+    # Process pool không pickle được, worker chỉ cần các bước xử lý
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['executor'] = None
+        return state
+
+    def reset_stats(self):
+        self.stage_seconds = {name: 0.0 for name, _ in self.stages}
+        self.stage_calls = {name: 0 for name, _ in self.stages}
+
+    def process_timed(self, text):
+        timings = []
+        for name, stage in self.stages:
+            start = time.perf_counter()
+            text = stage(text)
+            timings.append(time.perf_counter() - start)
+        return text, timings
+
+    def add_timings(self, timings):
+        for (name, _), seconds in zip(self.stages, timings):
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += 1
+        if profiler.active():
+            for (name, _), seconds in zip(self.stages, timings):
+                profiler.record(f'preprocess.{name}', seconds)
+
+    def process(self, text):
+        text, timings = self.process_timed(text)
+        self.add_timings(timings)
+        return text
+
+    __call__ = process
+
+    # Giữ một process pool dùng chung cho mọi lần gọi run() bên trong khối with
+    @contextlib.contextmanager
+    def worker_pool(self, workers=None):
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or self.executor is not None:
+            yield self
+            return
+        # Nạp trước ở process chính để các process con (fork) không phải tự import lại
+        init_postag_worker()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_pipeline_worker, initargs=(self,)) as executor:
+            self.executor, self.workers = executor, workers
+            try:
+                yield self
+            finally:
+                self.executor, self.workers = None, 1
+
+    # workers=None dùng tất cả các core; chỉ giữ tối đa batch_size review trong bộ nhớ mỗi lúc.
+    # Nếu đang ở trong worker_pool() thì dùng pool đó.
+    def run(self, texts, workers=1, batch_size=1000):
+        if self.executor is None:
+            workers = workers or os.cpu_count() or 1
+            if workers <= 1:
+                for text in texts:
+                    yield self.process(text)
+            else:
+                with self.worker_pool(workers):
+                    yield from self.run(texts, batch_size=batch_size)
+            return
+        texts = iter(texts)
+        while True:
+            batch = list(itertools.islice(texts, batch_size))
+            if not batch:
+                break
+            chunksize = max(1, len(batch) // (self.workers * 4))
+            for text, timings in self.executor.map(run_pipeline_worker, batch, chunksize=chunksize):
+                self.add_timings(timings)
+                yield text
+
+    def stats(self):
+        return {name: {'calls': self.stage_calls[name], 'seconds': self.stage_seconds[name]} for name, _ in self.stages}
+
+
+pipeline_worker = None
+
+def init_pipeline_worker(pipeline):
+    global pipeline_worker
+    pipeline_worker = pipeline
+    init_postag_worker()
+
+def run_pipeline_worker(text):
+    return pipeline_worker.process_timed(text)
+
+
+
+# Tăng số này khi thay đổi cách tiền xử lý, để cache dự đoán cũ không còn được dùng
+PIPELINE_VERSION = 1
+
+# Namespace cho PredictionCache: đổi khi model, vectorizer, từ điển hoặc cách tiền xử lý thay đổi
+def prediction_namespace(model, vectorizer, data):
+    from prediction_cache import fingerprint
+    return fingerprint(model, vectorizer, data, PIPELINE_VERSION)
+
+# Phân loại danh sách review, trả về (clean_text, label, probability) cho từng review.
+# Review trùng nhau chỉ xử lý một lần, review đã có trong cache thì bỏ qua tiền xử lý.
+def classify_reviews(texts, pipeline, vectorizer, model, cache=None, workers=1):
+    texts = [text if isinstance(text, str) else str(text) for text in texts]
+    results = [None] * len(texts)
+    missing = {}
+    with profiler.stage('cache_lookup', items=len(texts)):
+        cached = cache.get_many(texts) if cache is not None else results
+    for i, (text, result) in enumerate(zip(texts, cached)):
+        if result is None:
+            missing.setdefault(text, []).append(i)
+        else:
+            results[i] = result
+
+    if missing:
+        raw_texts = list(missing)
+        clean_texts = list(pipeline.run(raw_texts, workers=workers))
+        with profiler.stage('tfidf_transform', items=len(clean_texts)):
+            matrix = vectorizer.transform(clean_texts)
+        with profiler.stage('predict', items=len(clean_texts)):
+            labels = model.predict(matrix)
+            probabilities = model.predict_proba(matrix).max(axis=1)
+        new_results = [(clean, str(label), float(probability)) for clean, label, probability in zip(clean_texts, labels, probabilities)]
+        if cache is not None:
+            cache.put_many(zip(raw_texts, new_results))
+        for text, result in zip(raw_texts, new_results):
+            for i in missing[text]:
+                results[i] = result
+    return results
+
+# Phân loại từng chunk DataFrame (ví dụ từ pd.read_csv(chunksize=...)), trả về từng chunk
+# đã có cột 'Predict' và 'Probability' (độ tin cậy của nhãn) ngay khi xong. Tất cả chunk dùng chung một process pool.
+def classify_chunks(chunks, pipeline, vectorizer, model, cache=None, workers=None):
+    with pipeline.worker_pool(workers):
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            chunk = chunk.rename(columns={chunk.columns[0]: "Comment"})
+            results = classify_reviews(chunk["Comment"].tolist(), pipeline, vectorizer, model, cache)
+            chunk['Predict'] = [label for _, label, _ in results]
+            chunk['Probability'] = [probability for _, _, probability in results]
+            yield chunk
+
+
+
+# Đọc file review theo từng chunk giống app: file csv lấy cột đầu tiên làm Comment, file txt mỗi dòng một review
+def read_review_chunks(file_path, chunksize):
+    import pandas as pd
+    if file_path.endswith('.csv'):
+        reader = pd.read_csv(file_path, chunksize=chunksize)
+    else:
+        reader = pd.read_csv(file_path, delimiter="\t", header=None, names=["Comment"], chunksize=chunksize)
+    for chunk in reader:
+        yield chunk.rename(columns={chunk.columns[0]: "Comment"})
+
+# Ghi ra file tạm rồi đổi tên, nên một part đã có trên đĩa luôn là part hoàn chỉnh
+def write_part(chunk, part_path):
+    tmp_path = part_path + '.tmp'
+    if part_path.endswith('.parquet'):
+        chunk.to_parquet(tmp_path, index=False)
+    else:
+        chunk.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, part_path)
+
+def combine_parts(part_paths, output_path):
+    if output_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Cột toàn giá trị rỗng trong một chunk có kiểu null, cần gộp schema của mọi part
+        schema = pa.unify_schemas([pq.read_schema(path) for path in part_paths], promote_options='permissive')
+        with pq.ParquetWriter(output_path, schema) as writer:
+            for path in part_paths:
+                writer.write_table(pq.read_table(path).select(schema.names).cast(schema))
+    else:
+        with open(output_path, 'w', encoding='utf-8', newline='') as output:
+            for i, path in enumerate(part_paths):
+                with open(path, encoding='utf-8', newline='') as part:
+                    if i > 0:
+                        part.readline()  # bỏ header của các part sau
+                    shutil.copyfileobj(part, output)
+
+# Phân loại cả file review, ghi kết quả (clean_Comment, Predict, Probability) theo từng chunk vào
+# thư mục <output_path>.parts. Nếu bị ngắt, chạy lại cùng lệnh sẽ bỏ qua các chunk đã xong.
+def classify_file(input_path, output_path, model, vectorizer, data, chunksize=5000, workers=None, cache=None):
+    extension = 'parquet' if output_path.endswith('.parquet') else 'csv'
+    if extension == 'parquet':
+        # Báo lỗi ngay thay vì sau khi đã phân loại xong chunk đầu tiên
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit('pyarrow is required for parquet output: pip install pyarrow, or write a .csv file')
+    parts_dir = output_path + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+    manifest = {'input': os.path.abspath(input_path), 'input_size': os.path.getsize(input_path), 'chunksize': chunksize}
+    manifest_path = os.path.join(parts_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as file:
+            if json.load(file) != manifest:
+                raise SystemExit(f"{parts_dir} was created for a different input or chunksize, delete it to start over")
+    else:
+        with open(manifest_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file)
+
+    pipeline = ReviewPipeline(data)
+    part_paths = []
+    num_resumed = num_classified = 0
+    start = time.perf_counter()
+    with pipeline.worker_pool(workers):
+        for index, chunk in enumerate(read_review_chunks(input_path, chunksize)):
+            part_path = os.path.join(parts_dir, f'part-{index:05d}.{extension}')
+            part_paths.append(part_path)
+            if os.path.exists(part_path):
+                num_resumed += len(chunk)
+                continue
+            results = classify_reviews(chunk["Comment"].tolist(), pipeline, vectorizer, model, cache)
+            chunk['clean_Comment'] = [clean for clean, _, _ in results]
+            chunk['Predict'] = [label for _, label, _ in results]
+            chunk['Probability'] = [probability for _, _, probability in results]
+            write_part(chunk, part_path)
+            num_classified += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"chunk {index}: {num_resumed + num_classified} reviews done, {num_classified / elapsed:.1f} reviews/s", flush=True)
+
+    if part_paths:
+        combine_parts(part_paths, output_path)
+    else:
+        import pandas as pd
+        write_part(pd.DataFrame(columns=["Comment", "clean_Comment", "Predict", "Probability"]), output_path)
+    shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - start
+    print(f"{num_classified} reviews classified in {elapsed:.1f}s ({num_classified / max(elapsed, 1e-9):.1f} reviews/s)"
+          + (f", {num_resumed} resumed from a previous run" if num_resumed else "") + f" -> {output_path}")
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m pre_process', description='Headless review classification')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    classify_parser = subparsers.add_parser('classify', help='classify a csv/txt review file into a csv or parquet file')
+    classify_parser.add_argument('input', help="csv file (first column is the review) or txt file (one review per line)")
+    classify_parser.add_argument('output', help="output file, .parquet or .csv")
+    classify_parser.add_argument('--chunksize', type=int, default=5000)
+    classify_parser.add_argument('--workers', type=int, default=None, help='preprocessing processes, default: all cores')
+    classify_parser.add_argument('--model', default=package_path('log_model_word_balance.pkl'))
+    classify_parser.add_argument('--vectorizer', default=package_path('vectorizer.pkl'))
+    classify_parser.add_argument('--cache-db', default=None, help='optional SQLite prediction cache shared with the app')
+    classify_parser.add_argument('--profile', default=None, help='write per-stage timings in Prometheus text format to this file')
+    args = parser.parse_args()
+
+    from prediction_cache import PredictionCache
+    from compact_model import load_classifier
+    vectorizer, model = load_classifier(args.model, args.vectorizer)
+    data = load_files()
+    cache = None
+    if args.cache_db:
+        cache = PredictionCache(db_path=args.cache_db, namespace=prediction_namespace(model, vectorizer, data))
+    profiler.enabled = profiler.enabled or args.profile is not None
+    classify_file(args.input, args.output, model, vectorizer, data,
+                  chunksize=args.chunksize, workers=args.workers, cache=cache)
+    if args.profile is not None:
+        with open(args.profile, 'w', encoding='utf-8') as file:
+            file.write(profiler.prometheus_text())
@@ -0,0 +1,129 @@
+import collections
+import hashlib
+import pickle
+import sqlite3
+import threading
+
+# Số tham số tối đa trong một câu WHERE key IN (...), dưới giới hạn 999 của các bản SQLite cũ
+SQL_BATCH_SIZE = 500
+
+
+def review_key(text, namespace=''):
+    return hashlib.sha1((namespace + '\n' + text).encode('utf-8')).hexdigest()
+
+
+# Dấu vân tay của những thứ quyết định kết quả dự đoán (model, vectorizer, từ điển...),
+# dùng làm namespace để model khác hoặc model train lại không đọc nhầm kết quả cũ
+def fingerprint(*objects):
+    digest = hashlib.sha1()
+    for obj in objects:
+        digest.update(pickle.dumps(obj, protocol=4))
+    return digest.hexdigest()
+
+
+# Cache kết quả dự đoán theo hash của review gốc: (clean_text, label, probability)
+# Tầng 1: LRU trong bộ nhớ, giới hạn maxsize phần tử
+# Tầng 2 (tùy chọn): file SQLite, giữ lại được sau khi khởi động lại app
+# namespace: thường là fingerprint(model, vectorizer, ...), được đưa vào key của mọi review
+class PredictionCache:
+    def __init__(self, maxsize=100000, db_path=None, namespace=''):
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.memory = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.db = None
+        if db_path is not None:
+            # Streamlit chạy mỗi phiên trên một thread riêng nên dùng chung connection có khóa
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS predictions '
+                            '(key TEXT PRIMARY KEY, clean_text TEXT, label TEXT, probability REAL)')
+            self.db.commit()
+
+    def remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def get(self, text):
+        key = review_key(text, self.namespace)
+        with self.lock:
+            result = self.memory.get(key)
+            if result is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return result
+            if self.db is not None:
+                row = self.db.execute('SELECT clean_text, label, probability FROM predictions WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    result = tuple(row)
+                    self.remember(key, result)
+                    self.disk_hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    # Tra cứu nhiều review cùng lúc: kết quả theo đúng thứ tự texts, None nếu chưa có.
+    # Các key không có trong bộ nhớ được tra trong SQLite bằng một câu WHERE key IN (...) mỗi lô
+    def get_many(self, texts):
+        keys = [review_key(text, self.namespace) for text in texts]
+        results = [None] * len(keys)
+        with self.lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                result = self.memory.get(key)
+                if result is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self.memory.move_to_end(key)
+                    results[i] = result
+                    self.memory_hits += 1
+            if self.db is not None and missing:
+                missing_keys = list(missing)
+                for start in range(0, len(missing_keys), SQL_BATCH_SIZE):
+                    batch = missing_keys[start:start + SQL_BATCH_SIZE]
+                    rows = self.db.execute('SELECT key, clean_text, label, probability FROM predictions '
+                                           f"WHERE key IN ({', '.join('?' * len(batch))})", batch).fetchall()
+                    for key, *result in rows:
+                        result = tuple(result)
+                        self.remember(key, result)
+                        for i in missing.pop(key):
+                            results[i] = result
+                            self.disk_hits += 1
+            self.misses += sum(len(indices) for indices in missing.values())
+        return results
+
+    def put(self, text, result):
+        self.put_many([(text, result)])
+
+    def put_many(self, items):
+        rows = [(review_key(text, self.namespace), tuple(result)) for text, result in items]
+        with self.lock:
+            for key, result in rows:
+                self.remember(key, result)
+            if self.db is not None:
+                self.db.executemany('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+                                    [(key,) + result for key, result in rows])
+                self.db.commit()
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute('DELETE FROM predictions')
+                self.db.commit()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_size': len(self.memory),
+            }
@@ -0,0 +1,86 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('review_profile')
+
+
+# Đo thời gian, số lần gọi và số phần tử xử lý của từng bước (tiền xử lý, TF-IDF, predict, vẽ biểu đồ...).
+# Mặc định tắt, không tốn gì ngoài một lần kiểm tra cờ. Bật cho cả process bằng biến môi trường
+# REVIEW_PROFILE=1, hoặc chỉ cho một request (một lần chạy script streamlit) bằng start_request().
+# Số liệu cộng dồn (totals) xuất được dạng Prometheus, số liệu của request hiện tại nằm trong trace
+# riêng của từng thread nên các phiên streamlit chạy song song không lẫn vào nhau.
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.local = threading.local()
+
+    def active(self):
+        return self.enabled or getattr(self.local, 'trace', None) is not None
+
+    def start_request(self):
+        self.local.trace = {}
+
+    # Trả về {name: {'calls', 'items', 'seconds'}} của request đang chạy trên thread này rồi kết thúc nó
+    def finish_request(self):
+        trace = getattr(self.local, 'trace', None) or {}
+        self.local.trace = None
+        return trace
+
+    def record(self, name, seconds, items=1):
+        trace = getattr(self.local, 'trace', None)
+        if not self.enabled and trace is None:
+            return
+        with self.lock:
+            stats = self.totals.setdefault(name, {'calls': 0, 'items': 0, 'seconds': 0.0})
+            stats['calls'] += 1
+            stats['items'] += items
+            stats['seconds'] += seconds
+        if trace is not None:
+            stats = trace.setdefault(name, {'calls': 0, 'items': 0, 'seconds': 0.0})
+            stats['calls'] += 1
+            stats['items'] += items
+            stats['seconds'] += seconds
+
+    @contextlib.contextmanager
+    def stage(self, name, items=1):
+        if not self.active():
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, items)
+
+    def stats(self):
+        with self.lock:
+            return {name: dict(stats) for name, stats in self.totals.items()}
+
+    def reset(self):
+        with self.lock:
+            self.totals.clear()
+
+    # Số liệu cộng dồn theo định dạng text của Prometheus
+    def prometheus_text(self):
+        lines = []
+        for metric, field, kind in (('review_stage_seconds_total', 'seconds', 'counter'),
+                                    ('review_stage_calls_total', 'calls', 'counter'),
+                                    ('review_stage_items_total', 'items', 'counter')):
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, stats in sorted(self.stats().items()):
+                lines.append(f'{metric}{{stage="{name}"}} {stats[field]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Ghi một dòng log JSON cho một request: {"event": ..., "stages": {name: {calls, items, seconds}}, ...}
+def log_trace(event, trace, **fields):
+    logger.info(json.dumps({'event': event, 'stages': trace, **fields}, ensure_ascii=False))
+
+
+profiler = Profiler(enabled=os.environ.get('REVIEW_PROFILE', '') not in ('', '0'))
@@ -0,0 +1,216 @@
+import argparse
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from data_loader import MERGED_COLUMNS, read_dataset
+from restaurant_summary import add_aspect_counts, build_summaries, is_up_to_date, load_summaries, word_frequencies
+
+WORDCLOUD_BACKGROUNDS = {'positive': 'white', 'negative': 'black'}
+
+
+# Cache ảnh PNG trên đĩa, giữ tối đa max_images ảnh, xóa ảnh lâu không dùng nhất khi đầy
+class ImageCache:
+    def __init__(self, directory='image_cache', max_images=20000):
+        self.directory = directory
+        self.max_images = max_images
+        self.puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.png')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            # Cập nhật thời gian truy cập để việc xóa ảnh theo kiểu LRU
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, png):
+        # Ghi ra file tạm rồi đổi tên để các phiên/process khác không đọc phải ảnh ghi dở
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(png)
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        # Quét thư mục mỗi 100 lần ghi, số ảnh có thể vượt max_images tạm thời tối đa 100 ảnh
+        self.puts += 1
+        if self.puts % 100 == 0:
+            self.evict()
+        return path
+
+    def evict(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.png')]
+        if len(entries) <= self.max_images:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_images]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+# matplotlib và wordcloud chỉ import khi thật sự phải vẽ (ảnh chưa có trong cache)
+def wordcloud_png(frequencies, background_color):
+    from wordcloud import WordCloud
+    wordcloud = WordCloud(width=700, height=400, background_color=background_color).generate_from_frequencies(frequencies)
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def bar_chart_png(table, title):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 4))
+    try:
+        table.plot(kind='bar', ax=ax)
+        ax.set_xlabel('')
+        ax.set_ylabel('')
+        ax.set_title(title, fontsize=10, loc='center')
+        ax.tick_params(axis='x', labelrotation=0)  # Ensure x-axis labels are horizontal
+        buffer = io.BytesIO()
+        # Cùng tham số st.pyplot dùng khi lưu ảnh
+        fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+    finally:
+        # Đóng figure để không rò rỉ bộ nhớ qua các lần chạy lại
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+# Key của ảnh gồm cả dấu vân tay dữ liệu nên ảnh cũ tự hết hiệu lực khi dữ liệu đổi
+def image_key(restaurant_id, summary, name):
+    return f"{restaurant_id}_{name}_{summary['fingerprint']}"
+
+
+# Trả về đường dẫn ảnh trong cache (hoặc bytes PNG nếu không dùng cache), None nếu không có từ nào để vẽ.
+# get_frequencies: hàm trả về {label: {word: count}}, chỉ được gọi khi ảnh chưa có trong cache
+def wordcloud_image(restaurant_id, summary, label, get_frequencies, cache=None):
+    key = image_key(restaurant_id, summary, f'wordcloud_{label}')
+    path = cache.get(key) if cache is not None else None
+    if path is not None:
+        return path
+    frequencies = get_frequencies().get(label)
+    if not frequencies:
+        return None
+    png = wordcloud_png(frequencies, WORDCLOUD_BACKGROUNDS[label])
+    return cache.put(key, png) if cache is not None else png
+
+
+def bar_chart_image(restaurant_id, summary, name, table, title, cache=None):
+    key = image_key(restaurant_id, summary, name)
+    path = cache.get(key) if cache is not None else None
+    if path is not None:
+        return path
+    png = bar_chart_png(table, title)
+    return cache.put(key, png) if cache is not None else png
+
+
+# Các biểu đồ cột của một nhà hàng: (name, table, title), bỏ qua bảng rỗng
+def summary_charts(summary):
+    charts = [
+        ('yearly', summary['yearly'], 'Number of Reviews by Year'),
+        ('monthly', summary['monthly'], 'Number of Reviews by Month'),
+        ('yearly_food', summary['yearly_aspects'].get('food'), 'Number of Words Related to FOOD in Reviews by Year'),
+        ('yearly_price', summary['yearly_aspects'].get('price'), 'Number of Words Related to PRICE in Reviews by Year'),
+        ('yearly_service', summary['yearly_aspects'].get('service'), 'Number of Words Related to SERVICE in Reviews by Year'),
+    ]
+    return [(name, table, title) for name, table, title in charts if table is not None and not table.empty]
+
+
+def render_restaurant(restaurant_id, summary, cache, get_frequencies=None):
+    if summary['missing_info'] or (summary['num_positive'] == 0 and summary['num_negative'] == 0):
+        return
+    for label in WORDCLOUD_BACKGROUNDS:
+        wordcloud_image(restaurant_id, summary, label, get_frequencies or (lambda: summary['word_frequencies'] or {}), cache)
+    for name, table, title in summary_charts(summary):
+        bar_chart_image(restaurant_id, summary, name, table, title, cache)
+
+
+# Tên các ảnh của nhà hàng chưa có trong cache. Bỏ qua word cloud của label không có review,
+# hoặc đã biết là không có từ nào để vẽ (ảnh đó không bao giờ được lưu)
+def missing_images(restaurant_id, summary, cache):
+    if summary['missing_info'] or (summary['num_positive'] == 0 and summary['num_negative'] == 0):
+        return []
+    names = [name for name, _, _ in summary_charts(summary)]
+    frequencies = summary['word_frequencies']
+    for label in WORDCLOUD_BACKGROUNDS:
+        if summary[f'num_{label}'] > 0 and (frequencies is None or frequencies.get(label)):
+            names.append(f'wordcloud_{label}')
+    return [name for name in names if cache.get(image_key(restaurant_id, summary, name)) is None]
+
+
+render_cache = None
+
+def init_render_worker(cache):
+    global render_cache
+    render_cache = cache
+
+def render_restaurant_item(item):
+    restaurant_id, summary = item
+    render_restaurant(restaurant_id, summary, render_cache)
+
+# Vẽ trước mọi ảnh của một nhà hàng vào render_cache. rows: các review của nhà hàng, chỉ dùng để tính
+# tần suất từ khi summary chưa có và ảnh word cloud chưa có trong cache. Trả về tần suất từ (hoặc None).
+def prepare_restaurant_item(item):
+    restaurant_id, summary, rows = item
+
+    def get_frequencies():
+        if summary['word_frequencies'] is None:
+            summary['word_frequencies'] = word_frequencies(rows) if rows is not None else {}
+        return summary['word_frequencies']
+
+    render_restaurant(restaurant_id, summary, render_cache, get_frequencies)
+    return summary['word_frequencies']
+
+
+# Vẽ trước ảnh của nhiều nhà hàng song song (matplotlib không an toàn khi chạy nhiều thread nên dùng process).
+# Chỉ các nhà hàng còn thiếu ảnh trong cache mới được gửi sang process con, không thiếu ảnh nào thì không tạo pool.
+# Tần suất từ tính trong process con được ghi lại vào summaries để không phải tính lại.
+def prepare_restaurants(restaurant_ids, summaries, df, cache, workers=None):
+    restaurant_ids = [restaurant_id for restaurant_id in restaurant_ids
+                      if missing_images(restaurant_id, summaries[restaurant_id], cache)]
+    if not restaurant_ids:
+        return
+    items = []
+    for restaurant_id in restaurant_ids:
+        summary = summaries[restaurant_id]
+        rows = df[df['IDRestaurant'] == restaurant_id] if summary['word_frequencies'] is None else None
+        items.append((restaurant_id, summary, rows))
+    workers = min(workers or os.cpu_count() or 1, len(items))
+    if workers <= 1:
+        init_render_worker(cache)
+        results = [prepare_restaurant_item(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker, initargs=(cache,)) as executor:
+            results = list(executor.map(prepare_restaurant_item, items))
+    for restaurant_id, frequencies in zip(restaurant_ids, results):
+        if frequencies is not None:
+            summaries[restaurant_id]['word_frequencies'] = frequencies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render word clouds and charts of every restaurant into the image cache')
+    parser.add_argument('csv_file', nargs='?', default='merged_df.csv')
+    parser.add_argument('--summary', default='restaurant_summary.pkl')
+    parser.add_argument('--cache-dir', default='image_cache')
+    parser.add_argument('--max-images', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if is_up_to_date(args.summary, args.csv_file):
+        summaries = load_summaries(args.summary)
+    else:
+        df = add_aspect_counts(read_dataset(args.csv_file, columns=MERGED_COLUMNS).fillna(''))
+        summaries = build_summaries(df, with_word_frequencies=True)
+    cache = ImageCache(args.cache_dir, args.max_images)
+
+    items = list(summaries.items())
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_render_worker, initargs=(cache,)) as executor:
+        for done, _ in enumerate(executor.map(render_restaurant_item, items, chunksize=8), 1):
+            if done % 100 == 0 or done == len(items):
+                print(f'{done}/{len(items)} restaurants rendered')
+    cache.evict()
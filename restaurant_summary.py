@@ -0,0 +1,206 @@
+import argparse
+import functools
+import os
+import pickle
+import re
+import numpy as np
+import pandas as pd
+from data_loader import MERGED_COLUMNS, converted_path, package_path, read_dataset
+
+ASPECT_COLUMNS = {'food': 'count_food', 'price': 'count_price', 'service': 'count_service'}
+ASPECT_LEXICONS = {'food': 'food_word.txt', 'price': 'price_word.txt', 'service': 'service_word.txt'}
+
+
+def load_aspect_words(aspect):
+    with open(package_path(ASPECT_LEXICONS[aspect]), encoding='utf-8') as file:
+        return sorted({line.strip().lower() for line in file if line.strip()})
+
+
+# Gộp các từ/cụm từ thành một regex dạng cây theo từng âm tiết, ví dụ giá, giá cả, giá chát
+# thành giá(?:[ _](?:cả|chát))?: mỗi vị trí chỉ thử một nhánh và luôn ưu tiên cụm dài nhất.
+# Âm tiết trong cụm ngăn cách bởi dấu cách hoặc '_' (từ ghép sau khi tách từ: đồ_ăn, giá_cả).
+def aspect_alternatives(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for syllable in word.split():
+            node = node.setdefault(syllable, {})
+        node[''] = {}
+
+    def alternatives(node):
+        branches = []
+        for syllable in sorted((key for key in node if key), key=lambda key: (-len(key), key)):
+            child = node[syllable]
+            tail = ''
+            if any(child):
+                rest = alternatives(child)
+                tail = f'(?:[ _](?:{rest}))?' if '' in child else f'[ _](?:{rest})'
+            branches.append(re.escape(syllable) + tail)
+        return '|'.join(branches)
+
+    return alternatives(trie)
+
+
+# Regex của một khía cạnh. Chỉ khớp trọn âm tiết: "cá" không khớp trong "các"
+@functools.lru_cache(maxsize=None)
+def aspect_pattern(aspect):
+    return re.compile(rf'(?<![^\W_])(?:{aspect_alternatives(load_aspect_words(aspect))})(?![^\W_])')
+
+
+# Đếm số từ liên quan đến từng khía cạnh (food/price/service) trong mỗi review, trả về DataFrame
+# có các cột count_food, count_price, count_service cùng index với comments.
+# Nối mọi review thành một chuỗi, mỗi khía cạnh quét chuỗi đó một lần bằng regex riêng (một cụm như "giá chát"
+# được tính cho cả price lẫn food), rồi dựa vào vị trí để biết mỗi kết quả thuộc review nào.
+def count_aspects(comments, aspects=ASPECT_COLUMNS):
+    aspects = list(aspects)
+    texts = comments.fillna('').astype(str).str.lower().tolist()
+    text = '\n'.join(texts)
+    # Vị trí kết thúc (tính cả '\n' ngăn cách) của từng review trong chuỗi nối
+    ends = np.cumsum(np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts)))
+    counts = {}
+    for aspect in aspects:
+        starts = np.fromiter((match.start() for match in aspect_pattern(aspect).finditer(text)), dtype=np.int64)
+        counts[ASPECT_COLUMNS[aspect]] = np.bincount(np.searchsorted(ends, starts, side='right'), minlength=len(texts))
+    return pd.DataFrame(counts, columns=[ASPECT_COLUMNS[aspect] for aspect in aspects], index=comments.index)
+
+
+# Thêm các cột count_* còn thiếu (hoặc tính lại tất cả nếu recount=True) từ cột clean_Comment
+def add_aspect_counts(df, recount=False):
+    aspects = [aspect for aspect, column in ASPECT_COLUMNS.items() if recount or column not in df.columns]
+    if not aspects or 'clean_Comment' not in df.columns:
+        return df
+    return df.assign(**count_aspects(df['clean_Comment'], aspects))
+
+
+# Tách bảng đếm (IDRestaurant, key, label) thành bảng của từng nhà hàng: index=key, cột=label
+def split_by_restaurant(counts):
+    return {restaurant_id: table.droplevel(0).unstack(fill_value=0)
+            for restaurant_id, table in counts.groupby(level=0)}
+
+
+# Tần suất từ cho word cloud của từng label: {label: {word: count}}
+# (giống bước xử lý text bên trong WordCloud.generate)
+def word_frequencies(restaurant_data):
+    from wordcloud import WordCloud
+    wordcloud = WordCloud()
+    frequencies = {}
+    for label, comments in restaurant_data.groupby('label')['clean_Comment']:
+        text = " ".join(comments)
+        frequencies[label] = wordcloud.process_text(text) if text.strip() else {}
+    return frequencies
+
+
+# Tính sẵn thông tin và số liệu cho biểu đồ của mọi nhà hàng trong một lượt duyệt merged_df.
+# Kết quả: {IDRestaurant: dict}, tra cứu O(1) thay vì lọc cả DataFrame mỗi lần tìm kiếm.
+# with_word_frequencies=False bỏ qua bước tốn thời gian nhất, khi đó tần suất từ sẽ được tính khi cần.
+def build_summaries(df, with_word_frequencies=False):
+    if df.empty:
+        return {}
+    groups = df.groupby('IDRestaurant', sort=False)
+    # Dấu vân tay dữ liệu của từng nhà hàng, đổi khi bất kỳ review nào của nhà hàng thay đổi
+    fingerprints = pd.util.hash_pandas_object(df, index=False).groupby(df['IDRestaurant']).sum()
+    first = groups[['Restaurant', 'Address', 'Time', 'Price']].first()
+    missing_info = df[['Restaurant', 'Address', 'Time', 'Price']].isna().any(axis=1).groupby(df['IDRestaurant']).any()
+    average_rating = groups['Rating'].mean()
+    label_counts = df.groupby(['IDRestaurant', 'label']).size().unstack(fill_value=0)
+
+    summaries = {}
+    for restaurant_id, row in first.iterrows():
+        summaries[restaurant_id] = {
+            'name': row['Restaurant'],
+            'address': row['Address'],
+            'time': row['Time'],
+            'price': row['Price'],
+            'missing_info': bool(missing_info[restaurant_id]),
+            'average_rating': round(average_rating[restaurant_id], 2),
+            'num_positive': int(label_counts.at[restaurant_id, 'positive']) if 'positive' in label_counts else 0,
+            'num_negative': int(label_counts.at[restaurant_id, 'negative']) if 'negative' in label_counts else 0,
+            'yearly': None,
+            'monthly': None,
+            'yearly_aspects': {},
+            'fingerprint': f"{fingerprints[restaurant_id]:016x}",
+            'word_frequencies': None,
+        }
+
+    if with_word_frequencies:
+        for restaurant_id, restaurant_data in groups:
+            summaries[restaurant_id]['word_frequencies'] = word_frequencies(restaurant_data)
+
+    if 'date' in df.columns:
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        keys = {'Year': dates.dt.year.astype('Int64'), 'Month': dates.dt.month.astype('Int64')}
+        for period, key in (('Year', 'yearly'), ('Month', 'monthly')):
+            counts = df.groupby([df['IDRestaurant'], keys[period].rename(period), df['label']]).size()
+            for restaurant_id, table in split_by_restaurant(counts).items():
+                summaries[restaurant_id][key] = table
+
+        for aspect, column in ASPECT_COLUMNS.items():
+            if column not in df.columns:
+                continue
+            sums = df.groupby([df['IDRestaurant'], keys['Year'].rename('Year'), df['label']])[column].sum()
+            for restaurant_id, table in split_by_restaurant(sums).items():
+                summaries[restaurant_id]['yearly_aspects'][aspect] = table
+
+    return summaries
+
+
+# Bảng so sánh nhiều nhà hàng trong một lượt groupby trên các dòng của chúng (df chỉ cần chứa các nhà hàng này).
+# Trả về (table, yearly, aspects): table một dòng mỗi nhà hàng; yearly số review theo năm (cột = nhà hàng);
+# aspects tổng số từ về food/price/service (cột = nhà hàng). Nhà hàng được gọi bằng "ID - tên".
+def compare_restaurants(df, restaurant_ids):
+    df = df[df['IDRestaurant'].isin(restaurant_ids)]
+    names = df.groupby('IDRestaurant')['Restaurant'].first()
+    names = names.index.astype(str) + ' - ' + names.astype(str)
+    keys = df['IDRestaurant'].map(names).rename('Restaurant')
+    groups = df.groupby(keys)
+
+    table = pd.DataFrame({
+        'Rating': pd.to_numeric(df['Rating'], errors='coerce').groupby(keys).mean().round(2),
+        'Reviews': groups.size(),
+    })
+    labels = df.groupby([keys, df['label']]).size().unstack(fill_value=0)
+    for label in ('positive', 'negative'):
+        table[label.capitalize()] = labels[label] if label in labels else 0
+    table['Positive %'] = (100 * table['Positive'] / table['Reviews']).round(1)
+    columns = [column for column in ASPECT_COLUMNS.values() if column in df.columns]
+    aspects = groups[columns].sum()
+    table = table.join(aspects)
+
+    years = pd.to_datetime(df['date'], errors='coerce').dt.year.astype('Int64').rename('Year')
+    yearly = df.groupby([years, keys]).size().unstack(fill_value=0)
+    aspects = aspects.rename(columns={column: aspect for aspect, column in ASPECT_COLUMNS.items()}).T
+    # Giữ thứ tự nhà hàng như người dùng nhập
+    order = [names[restaurant_id] for restaurant_id in dict.fromkeys(restaurant_ids) if restaurant_id in names.index]
+    return table.reindex(order), yearly.reindex(columns=order), aspects.reindex(columns=order)
+
+
+def save_summaries(summaries, file_path):
+    with open(file_path, 'wb') as file:
+        pickle.dump(summaries, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_summaries(file_path):
+    with open(file_path, 'rb') as file:
+        return pickle.load(file)
+
+
+# File summary còn dùng được nếu mới hơn dữ liệu gốc (csv hoặc bản parquet/feather)
+def is_up_to_date(summary_path, csv_path):
+    if not os.path.exists(summary_path):
+        return False
+    sources = [csv_path, converted_path(csv_path, 'parquet'), converted_path(csv_path, 'feather')]
+    return all(os.path.getmtime(summary_path) >= os.path.getmtime(path) for path in sources if os.path.exists(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute per-restaurant summaries used by analyze_general')
+    parser.add_argument('csv_file', nargs='?', default='merged_df.csv')
+    parser.add_argument('-o', '--output', default='restaurant_summary.pkl')
+    parser.add_argument('--recount-aspects', action='store_true',
+                        help='recompute count_food/count_price/count_service from clean_Comment instead of using the csv columns')
+    args = parser.parse_args()
+
+    df = add_aspect_counts(read_dataset(args.csv_file, columns=MERGED_COLUMNS).fillna(''), recount=args.recount_aspects)
+    summaries = build_summaries(df, with_word_frequencies=True)
+    save_summaries(summaries, args.output)
+    print(f'{len(summaries)} restaurants -> {args.output}')
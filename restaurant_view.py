@@ -0,0 +1,70 @@
+import streamlit as st
+from profiling import profiler
+from restaurant_summary import build_summaries, word_frequencies
+from restaurant_charts import wordcloud_image, bar_chart_image, summary_charts
+
+# summaries: kết quả của restaurant_summary.build_summaries, restaurant_index: df.groupby('IDRestaurant').indices,
+# image_cache: restaurant_charts.ImageCache. Không truyền vào thì tính tại chỗ cho riêng nhà hàng này
+def analyze_general(df, restaurant_id, summaries=None, restaurant_index=None, image_cache=None):
+    if summaries is None:
+        summaries = build_summaries(df[df['IDRestaurant'] == restaurant_id])
+    summary = summaries.get(restaurant_id)
+
+    if summary is None:
+        st.error("Restaurant ID not found.")
+        return
+    
+    # Extract basic information
+    if summary['missing_info']:
+        st.error("This restaurant does not have enough basic information to show detailed data.")
+        return
+    
+    st.markdown(f"**Name:** {summary['name']}")
+    st.markdown(f"**Address:** {summary['address']}")
+    st.markdown(f"**Opening time:** {summary['time']}")
+    st.markdown(f"**Price:** {summary['price']}")
+    st.markdown(f"**Rating:** {summary['average_rating']} ⭐")
+    
+    # Analyze reviews
+    num_positive_reviews = summary['num_positive']
+    num_negative_reviews = summary['num_negative']
+    
+    st.markdown(f"**Number of Positive Reviews:** {num_positive_reviews}")
+    st.markdown(f"**Number of Negative Reviews:** {num_negative_reviews}")
+    
+    if num_positive_reviews == 0 and num_negative_reviews == 0:
+        st.error("This restaurant does not have enough review data to show detailed analysis.")
+        return
+
+    # Tần suất từ chỉ tính khi ảnh word cloud chưa có trong cache, và tính một lần cho mỗi nhà hàng
+    def get_frequencies():
+        if summary['word_frequencies'] is None:
+            if restaurant_index is not None:
+                restaurant_data = df.iloc[restaurant_index[restaurant_id]]
+            else:
+                restaurant_data = df[df['IDRestaurant'] == restaurant_id]
+            with profiler.stage('chart.word_frequencies', items=len(restaurant_data)):
+                summary['word_frequencies'] = word_frequencies(restaurant_data)
+        return summary['word_frequencies']
+
+    # Generate word clouds
+    if num_positive_reviews > 0:
+        with profiler.stage('chart.wordcloud_positive'):
+            image = wordcloud_image(restaurant_id, summary, 'positive', get_frequencies, image_cache)
+            if image is not None:
+                st.write("<div style='text-align: center; font-size: 14px; font-weight: bold;'>Positive Reviews Word Cloud</div>", unsafe_allow_html=True)
+                st.image(image, use_column_width=True)
+    
+    if num_negative_reviews > 0:
+        with profiler.stage('chart.wordcloud_negative'):
+            image = wordcloud_image(restaurant_id, summary, 'negative', get_frequencies, image_cache)
+            if image is not None:
+                st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
+                st.write("<div style='text-align: center; font-size: 14px; font-weight: bold;'>Negative Reviews Word Cloud</div>", unsafe_allow_html=True)
+                st.image(image, use_column_width=True)
+
+    # Generate bar charts for reviews by year and month, and for words related to food/price/service by year
+    for name, table, title in summary_charts(summary):
+        with profiler.stage(f'chart.{name}'):
+            st.write("<br>", unsafe_allow_html=True)  # Adding spacing between charts
+            st.image(bar_chart_image(restaurant_id, summary, name, table, title, image_cache), use_column_width=True)
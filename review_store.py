@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+import pandas as pd
+from data_loader import MERGED_COLUMNS, package_path
+from restaurant_summary import add_aspect_counts, build_summaries, load_summaries, save_summaries
+
+# Kiểu dữ liệu cố định của mọi cột, để các file parquet ghi ở các lần ingest khác nhau có cùng schema
+STORE_COLUMNS = {
+    'IDRestaurant': 'int64', 'Restaurant': 'string', 'Address': 'string', 'Time': 'string', 'Price': 'string',
+    'Rating': 'float64', 'Comment': 'string', 'label': 'string', 'clean_Comment': 'string', 'date': 'string',
+    'count_food': 'int64', 'count_price': 'int64', 'count_service': 'int64',
+}
+NUM_PARTITIONS = 64
+
+
+# Kho review chỉ ghi thêm (append-only), chia partition theo IDRestaurant % NUM_PARTITIONS:
+#   <directory>/partition=NN/<sha1 file nguồn>-<số chunk>.parquet   mỗi chunk ingest thêm file mới, không sửa file cũ
+#   <directory>/summaries.pkl        số liệu của từng nhà hàng (restaurant_summary.build_summaries)
+#   <directory>/manifest.json        các file đã ingest (theo sha1) và số chunk đã xong, để chạy lại không bị trùng
+# Đọc một nhà hàng chỉ cần đọc một partition, ingest chỉ tính lại số liệu của các nhà hàng có review mới.
+class ReviewStore:
+    def __init__(self, directory='review_store'):
+        self.directory = directory
+        self.summary_path = os.path.join(directory, 'summaries.pkl')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+
+    def exists(self):
+        return os.path.exists(self.summary_path)
+
+    def partition_dir(self, partition):
+        return os.path.join(self.directory, f'partition={partition:02d}')
+
+    def partition_of(self, restaurant_id):
+        return int(restaurant_id) % NUM_PARTITIONS
+
+    # Ghi thêm các dòng của df (đủ các cột STORE_COLUMNS), mỗi partition một file tên name.
+    # Ghi lại cùng name sẽ thay file cũ, nên chạy lại một chunk bị ngắt giữa chừng không sinh dòng trùng
+    def append(self, df, name=None):
+        df = df.reindex(columns=list(STORE_COLUMNS))
+        for column, dtype in STORE_COLUMNS.items():
+            if dtype == 'int64':
+                df[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).astype('int64')
+            elif dtype == 'float64':
+                df[column] = pd.to_numeric(df[column], errors='coerce')
+            else:
+                df[column] = df[column].astype('string')
+        name = (name or f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}") + '.parquet'
+        for partition, rows in df.groupby(df['IDRestaurant'] % NUM_PARTITIONS):
+            directory = self.partition_dir(partition)
+            os.makedirs(directory, exist_ok=True)
+            # Ghi file tạm (không có đuôi .parquet nên không bị đọc) rồi đổi tên
+            tmp_path = os.path.join(directory, name + '.tmp')
+            rows.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(directory, name))
+
+    # Đọc review của các nhà hàng trong restaurant_ids (chỉ đọc các partition chứa chúng), None là đọc tất cả
+    def read(self, restaurant_ids=None, columns=None):
+        if restaurant_ids is None:
+            partitions = range(NUM_PARTITIONS)
+        else:
+            restaurant_ids = [int(restaurant_id) for restaurant_id in restaurant_ids]
+            partitions = sorted({self.partition_of(restaurant_id) for restaurant_id in restaurant_ids})
+        frames = []
+        for partition in partitions:
+            directory = self.partition_dir(partition)
+            paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                           if name.endswith('.parquet')) if os.path.isdir(directory) else []
+            for path in paths:
+                frame = pd.read_parquet(path, columns=columns and list(dict.fromkeys(['IDRestaurant'] + columns)))
+                if restaurant_ids is not None:
+                    frame = frame[frame['IDRestaurant'].isin(restaurant_ids)]
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame({column: pd.Series(dtype=STORE_COLUMNS[column]) for column in columns or STORE_COLUMNS})
+        df = pd.concat(frames, ignore_index=True)
+        return df if columns is None else df[columns]
+
+    # Phiên bản của dữ liệu, đổi sau mỗi lần ingest (app dùng để biết khi nào cần nạp lại summaries)
+    def version(self):
+        return os.path.getmtime(self.summary_path) if self.exists() else 0.0
+
+    def load_summaries(self):
+        return load_summaries(self.summary_path) if self.exists() else {}
+
+    # Tính lại số liệu của các nhà hàng trong restaurant_ids từ partition của chúng, giữ nguyên các nhà hàng khác
+    def update_summaries(self, restaurant_ids):
+        summaries = self.load_summaries()
+        df = self.read(restaurant_ids, columns=MERGED_COLUMNS)
+        df = df.astype({column: object for column, dtype in STORE_COLUMNS.items()
+                        if dtype == 'string' and column in df.columns}).fillna('')
+        summaries.update(build_summaries(df, with_word_frequencies=True))
+        tmp_path = self.summary_path + '.tmp'
+        save_summaries(summaries, tmp_path)
+        os.replace(tmp_path, self.summary_path)
+        return summaries
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def save_manifest(self, manifest):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Ghi các chunk vào kho, sau đó tính lại số liệu của các nhà hàng bị ảnh hưởng.
+# prepare(chunk) trả về chunk đã đủ cột (clean_Comment, label, count_*...)
+# Mỗi chunk xong được ghi vào manifest. Nếu lần trước bị ngắt, chạy lại sẽ bỏ qua các chunk đã xong
+# (không gọi prepare) và ghi đè file của chunk đang dở, nên không có dòng nào bị ghi hai lần.
+def ingest_chunks(store, chunks, prepare, source, source_hash, chunksize):
+    manifest = store.load_manifest()
+    entry = manifest.get(source_hash, {})
+    if 'time' in entry:
+        print(f"{source} was already ingested on {entry['time']}, skipping")
+        return set()
+    if entry and entry.get('chunksize') != chunksize:
+        raise SystemExit(f"{source} was partly ingested with chunksize {entry.get('chunksize')}, re-run with that chunksize")
+    chunks_done = entry.get('chunks', 0)
+    os.makedirs(store.directory, exist_ok=True)
+    start = time.perf_counter()
+    restaurant_ids = set()
+    num_rows = num_chunks = 0
+    for index, chunk in enumerate(chunks):
+        if index >= chunks_done:
+            chunk = prepare(chunk)
+            store.append(chunk, name=f'{source_hash}-{index:05d}')
+            manifest[source_hash] = {'source': os.path.abspath(source), 'chunksize': chunksize, 'chunks': index + 1}
+            store.save_manifest(manifest)
+        restaurant_ids.update(int(restaurant_id) for restaurant_id in chunk['IDRestaurant'].unique())
+        num_rows += len(chunk)
+        num_chunks = index + 1
+        print(f"{num_rows} reviews appended ({num_rows / (time.perf_counter() - start):.1f} reviews/s)"
+              + (" (resumed)" if index < chunks_done else ""), flush=True)
+    store.update_summaries(restaurant_ids)
+    manifest[source_hash] = {'source': os.path.abspath(source), 'chunksize': chunksize, 'chunks': num_chunks,
+                             'rows': num_rows, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+    store.save_manifest(manifest)
+    print(f"{num_rows} reviews of {len(restaurant_ids)} restaurants ingested in {time.perf_counter() - start:.1f}s")
+    return restaurant_ids
+
+
+# Nạp merged_df.csv (đã có label và clean_Comment) vào kho lần đầu
+def import_dataset(store, csv_path, chunksize=100000):
+    def prepare(chunk):
+        return add_aspect_counts(chunk.fillna(''))
+
+    columns = MERGED_COLUMNS + ['Comment']
+    chunks = pd.read_csv(csv_path, usecols=lambda name: name in columns, chunksize=chunksize)
+    return ingest_chunks(store, chunks, prepare, csv_path, file_sha1(csv_path), chunksize)
+
+
+# Ingest review mới: csv có IDRestaurant, Restaurant, Address, Time, Price, Rating, Comment, date.
+# Chỉ các dòng mới đi qua tiền xử lý và model để có clean_Comment và label.
+def ingest_reviews(store, csv_path, model, vectorizer, data, chunksize=5000, workers=None, cache=None):
+    from pre_process import ReviewPipeline, classify_reviews
+    pipeline = ReviewPipeline(data)
+
+    def prepare(chunk):
+        results = classify_reviews(chunk['Comment'].fillna('').tolist(), pipeline, vectorizer, model, cache)
+        chunk = chunk.assign(clean_Comment=[clean for clean, _, _ in results], label=[label for _, label, _ in results])
+        return add_aspect_counts(chunk, recount=True)
+
+    with pipeline.worker_pool(workers):
+        return ingest_chunks(store, pd.read_csv(csv_path, chunksize=chunksize), prepare, csv_path, file_sha1(csv_path),
+                             chunksize)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Append-only review store partitioned by restaurant')
+    parser.add_argument('--store', default='review_store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='load an existing merged_df.csv (already labelled) into the store')
+    import_parser.add_argument('csv_file', nargs='?', default='merged_df.csv')
+    import_parser.add_argument('--chunksize', type=int, default=100000)
+
+    ingest_parser = subparsers.add_parser('ingest', help='classify new reviews and append them to the store')
+    ingest_parser.add_argument('csv_file', help='csv with IDRestaurant, Restaurant, Address, Time, Price, Rating, Comment, date')
+    ingest_parser.add_argument('--chunksize', type=int, default=5000)
+    ingest_parser.add_argument('--workers', type=int, default=None, help='preprocessing processes, default: all cores')
+    ingest_parser.add_argument('--model', default=package_path('log_model_word_balance.pkl'))
+    ingest_parser.add_argument('--vectorizer', default=package_path('vectorizer.pkl'))
+    args = parser.parse_args()
+
+    store = ReviewStore(args.store)
+    if args.command == 'import':
+        import_dataset(store, args.csv_file, args.chunksize)
+    else:
+        from pre_process import load_files
+        from compact_model import load_classifier
+        vectorizer, model = load_classifier(args.model, args.vectorizer)
+        ingest_reviews(store, args.csv_file, model, vectorizer, load_files(),
+                       chunksize=args.chunksize, workers=args.workers)
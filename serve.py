@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import json
+from compact_model import load_classifier
+from data_loader import package_path
+from pre_process import load_files, ReviewPipeline, classify_reviews, init_postag_worker, prediction_namespace
+from prediction_cache import PredictionCache
+from profiling import profiler
+
+
+# Gom các request đến đồng thời thành một batch, để transform/predict chạy trên cả ma trận thưa
+# thay vì từng dòng. Batch được chốt khi đủ max_batch_size review hoặc sau max_wait giây, và không bao giờ
+# vượt quá max_batch_size: request lớn được chia thành từng phần, request không vừa batch hiện tại chờ batch sau.
+class MicroBatcher:
+    def __init__(self, classify, max_batch_size=64, max_wait=0.01):
+        self.classify = classify
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        # Request đã lấy khỏi queue nhưng không vừa batch trước, đứng đầu batch sau
+        self.pending = None
+        self.num_batches = 0
+        self.num_reviews = 0
+
+    async def predict(self, texts):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            future = loop.create_future()
+            await self.queue.put((texts[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return [result for results in await asyncio.gather(*futures) for result in results]
+
+    async def next_batch(self):
+        loop = asyncio.get_running_loop()
+        requests = [self.pending or await self.queue.get()]
+        self.pending = None
+        size = len(requests[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if size + len(request[0]) > self.max_batch_size:
+                self.pending = request
+                break
+            requests.append(request)
+            size += len(request[0])
+        return requests
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = await self.next_batch()
+            texts = [text for request_texts, _ in requests for text in request_texts]
+            try:
+                # Chạy trong thread để event loop vẫn nhận request mới trong lúc xử lý batch
+                results = await loop.run_in_executor(None, self.classify, texts)
+            except Exception as error:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.num_batches += 1
+            self.num_reviews += len(texts)
+            offset = 0
+            for request_texts, future in requests:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+def prediction(result):
+    clean_text, label, probability = result
+    return {'label': label, 'probability': probability, 'clean_text': clean_text}
+
+
+# POST /predict {"review": "..."} hoặc {"reviews": ["...", ...]}, GET /health,
+# GET /metrics (thời gian từng bước dạng Prometheus, khi chạy với --profile hoặc REVIEW_PROFILE=1)
+async def route(method, path, body, batcher, cache):
+    if method == 'GET' and path == '/metrics':
+        return '200 OK', profiler.prometheus_text()
+    if method == 'GET' and path == '/health':
+        stats = {'status': 'ok', 'batches': batcher.num_batches, 'reviews': batcher.num_reviews,
+                 'avg_batch_size': batcher.num_reviews / batcher.num_batches if batcher.num_batches else 0.0}
+        if cache is not None:
+            stats['cache'] = cache.stats()
+        return '200 OK', stats
+    if path != '/predict':
+        return '404 Not Found', {'error': 'not found'}
+    if method != 'POST':
+        return '405 Method Not Allowed', {'error': 'use POST'}
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return '400 Bad Request', {'error': 'body must be JSON'}
+    if isinstance(payload, dict) and isinstance(payload.get('review'), str):
+        results = await batcher.predict([payload['review']])
+        return '200 OK', prediction(results[0])
+    if isinstance(payload, dict) and isinstance(payload.get('reviews'), list) and all(isinstance(review, str) for review in payload['reviews']):
+        results = await batcher.predict(payload['reviews']) if payload['reviews'] else []
+        return '200 OK', {'predictions': [prediction(result) for result in results]}
+    return '400 Bad Request', {'error': 'expected {"review": str} or {"reviews": [str, ...]}'}
+
+
+# Giới hạn kích thước body, request lớn hơn bị trả 413 thay vì đọc hết vào bộ nhớ
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+# payload là chuỗi thì trả về dạng text (dùng cho /metrics), còn lại trả về JSON
+def response(status, payload, keep_alive):
+    if isinstance(payload, str):
+        data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+    else:
+        data, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json'
+    return (f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + data
+
+
+# Đọc request line và header, trả về (method, path, headers, lỗi). Request sai định dạng trả về
+# lỗi (status, message) để trả 400/413 rồi đóng kết nối, vì không còn biết body kết thúc ở đâu
+async def read_request_head(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+        return None, None, headers, ('400 Bad Request', 'malformed request line')
+    method, path, _ = parts
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        return method, path, headers, ('400 Bad Request', 'invalid Content-Length')
+    if length < 0:
+        return method, path, headers, ('400 Bad Request', 'invalid Content-Length')
+    if length > MAX_BODY_BYTES:
+        return method, path, headers, ('413 Payload Too Large', f'body must be at most {MAX_BODY_BYTES} bytes')
+    return method, path, headers, None
+
+
+# HTTP/1.1 tối giản (có keep-alive), đủ cho việc gọi nội bộ từ các service khác
+async def handle_connection(reader, writer, batcher, cache):
+    try:
+        while True:
+            try:
+                head = await read_request_head(reader)
+            except ValueError:
+                # StreamReader.readline báo lỗi khi một dòng dài hơn giới hạn 64 KiB
+                head = None, None, {}, ('400 Bad Request', 'request line or header too long')
+            if head is None:
+                break
+            method, path, headers, error = head
+            if error is not None:
+                status, message = error
+                writer.write(response(status, {'error': message}, keep_alive=False))
+                await writer.drain()
+                break
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            try:
+                status, payload = await route(method, path.split('?', 1)[0], body, batcher, cache)
+            except Exception as error:
+                status, payload = '500 Internal Server Error', {'error': str(error)}
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            writer.write(response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        # Client đóng kết nối giữa chừng, không còn ai để trả lời
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(args):
+    data = load_files()
+    loaded_vectorizer, loaded_log_model_word_balance = load_classifier(args.model, args.vectorizer)
+    pipeline = ReviewPipeline(data)
+    # nltk/underthesea được import lười, nạp ngay để request đầu tiên không phải chờ
+    init_postag_worker()
+    cache = None
+    if not args.no_cache:
+        namespace = prediction_namespace(loaded_log_model_word_balance, loaded_vectorizer, data)
+        cache = PredictionCache(maxsize=args.cache_size, db_path=args.cache_db, namespace=namespace)
+
+    def classify(texts):
+        return classify_reviews(texts, pipeline, loaded_vectorizer, loaded_log_model_word_balance, cache)
+
+    batcher = MicroBatcher(classify, args.max_batch_size, args.max_wait_ms / 1000)
+    with pipeline.worker_pool(args.workers):
+        server = await asyncio.start_server(lambda reader, writer: handle_connection(reader, writer, batcher, cache),
+                                            args.host, args.port)
+        print(f"Serving on http://{args.host}:{args.port} (max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)", flush=True)
+        async with server:
+            await asyncio.gather(server.serve_forever(), batcher.run())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HTTP inference service for the review sentiment model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=1, help='preprocessing processes per batch')
+    parser.add_argument('--model', default=package_path('log_model_word_balance.pkl'))
+    parser.add_argument('--vectorizer', default=package_path('vectorizer.pkl'))
+    parser.add_argument('--cache-size', type=int, default=100000)
+    parser.add_argument('--cache-db', default=None)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--profile', action='store_true', help='record per-stage timings, exposed at GET /metrics')
+    args = parser.parse_args()
+    profiler.enabled = profiler.enabled or args.profile
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass